@@ -0,0 +1,45 @@
+"""
+Measures how batch operations scale with the batch size. Since batch code paths process all items with batched
+PyTorch kernels (no per-item Python loops), the time per item should stay flat or decrease as the batch grows.
+
+Usage: python benchmarks/batch.py
+"""
+
+import time
+import torch
+import tntorch as tn
+torch.set_default_dtype(torch.float64)
+
+
+def bench(function, repeat=3):
+    elapsed = 0
+    for r in range(repeat):
+        start = time.time()
+        function()
+        elapsed += time.time() - start
+    return elapsed / repeat
+
+
+if __name__ == '__main__':
+    shape = [8]*5
+    print('{:>8}{:>18}{:>18}{:>18}{:>18}'.format('batch', 'constructor (us)', 'round_tt (us)', 'svd eig (us)', 'norm (us)'))
+    for B in (1, 10, 100, 1000, 4000):
+        full = torch.rand([B] + shape)
+        t = tn.Tensor(full, ranks_tt=6, batch=True)
+        t = t + t*0.5
+
+        def round_tt():
+            t2 = t.clone()
+            t2.round_tt(1e-8)
+
+        def round_tt_eig():
+            t2 = t.clone()
+            t2.round_tt(1e-8, algorithm='eig')
+
+        times = [
+            bench(lambda: tn.Tensor(full, ranks_tt=6, batch=True)),
+            bench(round_tt),
+            bench(round_tt_eig),
+            bench(lambda: tn.norm(t)),
+        ]
+        print('{:>8}'.format(B) + ''.join(['{:>18.2f}'.format(1e6 * time / B) for time in times]))
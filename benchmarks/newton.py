@@ -0,0 +1,35 @@
+"""
+Compares Newton-Schulz iterations (:func:`ops.newton()`) against cross-approximation for element-wise reciprocals,
+inverse square roots and square roots of moderate-rank TT tensors.
+
+Usage: python benchmarks/newton.py
+"""
+
+import time
+import torch
+import tntorch as tn
+torch.set_default_dtype(torch.float64)
+
+
+def bench(function, t, repeat=3, **kwargs):
+    start = time.time()
+    for r in range(repeat):
+        result = function(t, **kwargs)
+    return result, (time.time() - start) / repeat
+
+
+if __name__ == '__main__':
+    x, y, z, w = tn.meshgrid([torch.linspace(1, 2, 64)]*4)
+    t = x + y*z + w + 1
+    t.round_tt(1e-10)
+    gt = t.torch()
+    print('Input: {}D tensor of shape {}, TT ranks {}'.format(t.dim(), list(t.shape), t.ranks_tt))
+    print()
+    print('{:<12}{:>14}{:>14}{:>14}{:>14}{:>10}'.format('function', 'cross time', 'cross error', 'newton time', 'newton error', 'speedup'))
+    for name, exact in (('reciprocal', torch.reciprocal), ('rsqrt', torch.rsqrt), ('sqrt', torch.sqrt)):
+        function = getattr(tn, name)
+        t_cross, time_cross = bench(function, t)
+        t_newton, time_newton = bench(function, t, algorithm='newton', eps=1e-6, bounds=(3, 7))
+        print('{:<12}{:>14.4f}{:>14.2e}{:>14.4f}{:>14.2e}{:>9.1f}x'.format(
+            name, time_cross, tn.relative_error(exact(gt), t_cross), time_newton,
+            tn.relative_error(exact(gt), t_newton), time_cross / time_newton))
@@ -0,0 +1,46 @@
+"""
+Compares the single-sweep TT-Tucker rounding (:meth:`Tensor.round()`) against the previous two-stage procedure:
+:meth:`Tensor.round_tt()` on a copy, a relative error check, and then :meth:`Tensor.round_tucker()`.
+
+Usage: python benchmarks/round.py
+"""
+
+import time
+import torch
+import tntorch as tn
+torch.set_default_dtype(torch.float64)
+
+
+def round_two_stage(t, eps):
+    copy = t.clone()
+    t.round_tt(eps)
+    reached = tn.relative_error(copy, t)
+    if reached < eps:
+        t.round_tucker((1+eps) / (1+reached) - 1)
+
+
+def round_single_sweep(t, eps):
+    t.round(eps)
+
+
+def bench(function, t, eps, repeat=3):
+    elapsed = 0
+    for r in range(repeat):
+        t2 = t.clone()
+        start = time.time()
+        function(t2, eps)
+        elapsed += time.time() - start
+    return t2, elapsed / repeat
+
+
+if __name__ == '__main__':
+    print('{:<22}{:>8}{:>14}{:>14}{:>14}{:>14}{:>10}'.format('shape', 'eps', 'two-stage', 'error', 'one sweep', 'error', 'speedup'))
+    for N, I, R in ((4, 64, 20), (8, 32, 20), (16, 32, 10), (8, 128, 30)):
+        t = tn.rand([I]*N, ranks_tt=R, ranks_tucker=R)
+        t = t + t*0.5  # Doubles all ranks: there is redundancy to remove
+        for eps in (1e-8, 1e-3):
+            t1, time1 = bench(round_two_stage, t, eps)
+            t2, time2 = bench(round_single_sweep, t, eps)
+            print('{:<22}{:>8.0e}{:>14.4f}{:>14.2e}{:>14.4f}{:>14.2e}{:>9.1f}x'.format(
+                '{}^{}, R={}'.format(I, N, R), eps, time1, tn.relative_error(t, t1), time2,
+                tn.relative_error(t, t2), time1 / time2))
@@ -32,3 +32,52 @@ def test_ops():
     assert tn.relative_error(1/t.torch(), 1/t) < 1e-4
     assert tn.relative_error(torch.cos(t.torch()), tn.cos(t)) < 1e-4
     assert tn.relative_error(torch.exp(t.torch()), tn.exp(t)) < 1e-4
+
+
+def test_validation():
+
+    def function(Xs):
+        return 1. / torch.sum(Xs, dim=1)
+
+    domain = [torch.linspace(1, 10, 10) for n in range(4)]
+    gt = 1. / sum(torch.meshgrid(domain))
+
+    t, info = tn.cross(function=function, domain=domain, function_arg='matrix', validation='samples', tol=1e-8, verbose=False, return_info=True)
+    assert tn.relative_error(gt, t) < 1e-4
+    assert len(info['val_epss']) < 25
+
+    # Any change in the error smaller than `tol` (measured on the same set) stops the iterations
+    for validation in ('random', 'samples'):
+        _, info = tn.cross(function=function, domain=domain, function_arg='matrix', validation=validation, eps=0, tol=10,
+                           verbose=False, return_info=True, suppress_warnings=True)
+        assert len(info['val_epss']) == 2
+
+    Xs = torch.randint(0, 10, (100, 4))
+    ys = gt[Xs[:, 0], Xs[:, 1], Xs[:, 2], Xs[:, 3]]
+    t = tn.cross(function=function, domain=domain, function_arg='matrix', validation=(Xs, ys), verbose=False)
+    assert tn.relative_error(gt, t) < 1e-4
+
+
+def test_multistart():
+
+    t = tn.rand([8] * 4, ranks_tt=3)
+    x = t.torch()
+    positions, values = tn.argmin(t, n_starts=4, n_workers=2, seed=0, k=3)
+    assert len(positions) == 3
+    assert torch.all(values[1:] >= values[:-1])
+    for position, value in zip(positions, values):
+        assert abs(x[position].item() - value.item()) < 1e-6
+    assert tn.minimum(t, n_starts=4, n_workers=2, seed=0) >= torch.min(x) - 1e-6
+
+
+def test_apply():
+
+    x, y, z = tn.meshgrid([torch.linspace(0, 1, 16)]*3)
+
+    def function(x, y, z):
+        return torch.exp(-torch.sqrt(x**2 + y**2)) * torch.sin(z)
+
+    gt = function(x.torch(), y.torch(), z.torch())
+    assert tn.relative_error(gt, tn.apply(function, x, y, z)) < 1e-4
+    assert tn.relative_error(gt, tn.elementwise(function)(x, y, z)) < 1e-4
+    assert tn.relative_error(gt, tn.elementwise(function)(x, y.torch(), z)) < 1e-4  # Mixed torch/tntorch arguments
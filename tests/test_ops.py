@@ -1,3 +1,4 @@
+from pytest import raises
 import numpy as np
 import tntorch as tn
 import torch
@@ -36,6 +37,95 @@ def test_ops():
         check(t1, t2)
 
 
+def test_batch_ops():
+
+    shape = [5, 6, 7, 8]
+    for ranks in [dict(ranks_tt=3), dict(ranks_tt=2, ranks_tucker=3), dict(ranks_cp=3)]:
+        t1 = tn.rand(shape, batch=True, **ranks)
+        t2 = tn.rand(shape, ranks_tt=2, batch=True)
+        t = t1 + t2
+        assert t.batch
+        assert torch.norm(t.torch() - (t1.torch() + t2.torch())) <= 1e-7 * torch.norm(t1.torch() + t2.torch())
+        t = t1 + t1
+        assert torch.norm(t.torch() - 2 * t1.torch()) <= 1e-7 * torch.norm(t1.torch())
+        t = t1 * t2
+        assert t.batch
+        assert torch.norm(t.torch() - t1.torch() * t2.torch()) <= 1e-7 * torch.norm(t1.torch() * t2.torch())
+
+
+
+def test_lazy_sum():
+
+    shape = [4, 5, 6, 7]
+    t1 = tn.rand(shape, ranks_tt=3, ranks_tucker=2)
+    t2 = tn.rand(shape, ranks_cp=2)
+    t3 = tn.rand(shape, ranks_tt=2)
+    t = t1 + t2 - t3
+    x = t1.torch() + t2.torch() - t3.torch()
+
+    # Linear operations are done term by term
+    assert len(t._summands()) == 3
+    assert torch.allclose(t.torch(), x)
+    assert torch.allclose(t[1, :, 2:4, 0].torch(), x[1, :, 2:4, 0])
+    assert torch.allclose(t[1, 2, 3, 4], x[1, 2, 3, 4])
+    assert torch.allclose(tn.dot(t, t1), torch.sum(x * t1.torch()))
+    assert torch.allclose(tn.norm(t), torch.norm(x))
+    assert torch.allclose(tn.relative_error(t, t1), torch.norm(x - t1.torch()) / torch.norm(x))
+    assert torch.allclose((2 * t).torch(), 2 * x)
+    assert torch.allclose((t * t2).torch(), x * t2.torch())
+    assert len(t._summands()) == 3
+
+    # Other operations assemble the block-diagonal cores
+    assert np.array_equal(t.ranks_tt[1:-1], t1.ranks_tt[1:-1] + t2.ranks_tt[1:-1] + t3.ranks_tt[1:-1])
+    assert len(t._summands()) == 1
+    assert torch.allclose(t.torch(), x)
+    assert torch.allclose(tn.round_tt(t1 + t1).torch(), 2 * t1.torch())
+
+    # Terms are shared with the summands (copy-on-write)
+    t = t1 + t3
+    t1.cores[1].mul_(2)
+    with raises(RuntimeError):
+        t.torch()
+
+def test_batch_metrics():
+
+    shape = [4, 5, 6, 7]
+    for ranks in [dict(ranks_tt=3), dict(ranks_tt=2, ranks_tucker=3), dict(ranks_cp=3)]:
+        t1 = tn.rand(shape, batch=True, **ranks)
+        t2 = tn.rand(shape, ranks_tt=2, batch=True)
+        x1 = t1.torch().reshape(shape[0], -1)
+        x2 = t2.torch().reshape(shape[0], -1)
+        assert torch.allclose(tn.dot(t1, t2), torch.sum(x1*x2, dim=1))
+        assert torch.allclose(tn.norm(t1), torch.norm(x1, dim=1))
+        assert torch.allclose(tn.dist(t1, t2), torch.norm(x1-x2, dim=1))
+        assert torch.allclose(tn.relative_error(t1, t2), torch.norm(x1-x2, dim=1) / torch.norm(x1, dim=1))
+        assert torch.allclose(tn.relative_error(t1, t2.torch()), torch.norm(x1-x2, dim=1) / torch.norm(x1, dim=1))
+        rmse = torch.norm(x1-x2, dim=1) / np.sqrt(x1.shape[1])
+        assert torch.allclose(tn.rmse(t1, t2), rmse)
+        assert torch.allclose(tn.rmse(t1.torch(), t2), rmse)  # Mixed torch/tntorch arguments
+
+
+def test_dots():
+
+    shape = [4, 5, 6]
+    for t1, t2 in [(tn.rand(shape, ranks_tt=2), tn.rand(shape, ranks_tt=3, ranks_tucker=2)),
+                   (tn.rand(shape, ranks_cp=3, ranks_tucker=2), tn.rand(shape, ranks_cp=4)),
+                   (tn.rand(shape, ranks_tt=2, batch=True), tn.rand(shape, ranks_tucker=2, batch=True))]:
+        d11, d22, d12 = tn.dots(t1, t2)
+        assert torch.allclose(d11, tn.dot(t1, t1))
+        assert torch.allclose(d22, tn.dot(t2, t2))
+        assert torch.allclose(d12, tn.dot(t1, t2))
+
+
+def test_gram():
+
+    shape = [4, 5, 6]
+    ts = [tn.rand(shape, ranks_tt=2), tn.rand(shape, ranks_tt=3, ranks_tucker=2), tn.rand(shape, ranks_cp=4)]
+    gt = torch.tensor([[tn.dot(t1, t2) for t2 in ts] for t1 in ts])
+    assert torch.allclose(tn.gram(ts), gt)
+    assert torch.allclose(tn.gram(ts, chunk_size=2), gt)
+
+
 def test_broadcast():
 
     for i in range(10):
@@ -46,6 +136,20 @@ def test_broadcast():
         t2 = random_format(shape2)
         check(t1, t2)
 
+    # Singleton modes are broadcast without copies
+    t1 = tn.rand([50, 60, 70], ranks_tt=3, ranks_tucker=2)
+    t2 = tn.rand([50, 1, 1], ranks_tt=2, ranks_tucker=[2, None, None])
+    _, t3 = tn.tensor._broadcast(t1, t2)
+    assert t3.shape == t1.shape
+    assert t3.cores[1].stride()[1] == 0 and t3.cores[1].data_ptr() == t2.cores[1].data_ptr()
+    assert torch.allclose((t1+t2).torch(), t1.torch()+t2.torch())
+    assert torch.allclose((t1*t2).torch(), t1.torch()*t2.torch())
+
+    # Batch tensors
+    t1 = tn.Tensor(torch.rand(3, 4, 5, 6), batch=True)
+    t2 = tn.Tensor(torch.rand(3, 4, 1, 6), batch=True)
+    assert torch.allclose((t1*t2).torch(), t1.torch()*t2.torch())
+
 
 def test_dot():
 
@@ -95,3 +199,46 @@ def test_stats():
         t = random_format(shape)
         check()
 
+
+
+def test_topk():
+
+    for i in range(10):
+        t = random_format([6, 7, 8])
+        x = t.torch().flatten()
+        for largest in (True, False):
+            values, Xs = tn.topk(t, 5, largest=largest)
+            gt = torch.topk(x, 5, largest=largest)[0]
+            assert torch.norm(values - gt) <= 1e-7 * torch.norm(gt)
+            assert torch.norm(t[Xs].torch() - values) <= 1e-7 * torch.norm(gt)
+
+
+def test_polynomials():
+
+    t = tn.rand([8]*4, ranks_tt=3)
+    x = t.torch()
+    assert tn.relative_error(t**3, x**3) <= 1e-7
+    assert tn.relative_error(tn.pow(t, 4), x**4) <= 1e-7
+    assert tn.relative_error(tn.polyval(t, [1, 0, -2, 1]), 1 - 2*x**2 + x**3) <= 1e-7
+    cheb = np.polynomial.chebyshev.chebval(x.numpy(), [0.5, -1, 0, 2])
+    assert np.linalg.norm(tn.polyval(t, [0.5, -1, 0, 2], basis='chebyshev').numpy() - cheb) <= 1e-7 * np.linalg.norm(cheb)
+
+    x = x.flatten()
+    z = (x - torch.mean(x)) / torch.sqrt(torch.mean((x - torch.mean(x))**2))
+    assert tn.relative_error(tn.skew(t), torch.mean(z**3)) <= 1e-7
+    assert tn.relative_error(tn.kurtosis(t), torch.mean(z**4) - 3) <= 1e-7
+
+
+def test_newton():
+
+    x, y, z = tn.meshgrid([torch.linspace(1, 2, 16)]*3)
+    t = x + y*z
+    gt = t.torch()
+    assert tn.relative_error(1/gt, tn.reciprocal(t, algorithm='newton', eps=1e-10)) <= 1e-8
+    assert tn.relative_error(torch.rsqrt(gt), tn.rsqrt(t, algorithm='newton', eps=1e-10)) <= 1e-8
+    assert tn.relative_error(torch.sqrt(gt), tn.sqrt(t, algorithm='newton', eps=1e-10, bounds=(2, 6))) <= 1e-8
+    assert tn.relative_error(x.torch()/gt, tn.div(x, t, algorithm='newton', eps=1e-10)) <= 1e-8
+    assert tn.relative_error(x.torch()/gt, tn.div(x, t, algorithm='newton', svd_algorithm='eig', eps=1e-10)) <= 1e-6
+
+    t = x - 1.5  # Mixed signs
+    assert tn.relative_error(1/t.torch(), tn.reciprocal(t, algorithm='newton', eps=1e-10, max_iter=200)) <= 1e-6
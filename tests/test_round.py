@@ -1,4 +1,5 @@
 import numpy as np
+import threading
 import tntorch as tn
 import torch
 torch.set_default_dtype(torch.float64)
@@ -18,6 +19,32 @@ def test_orthogonalization():
         assert tn.relative_error(gt, t) <= 1e-7
 
 
+def test_to_cp():
+    gt = tn.rand([5, 6, 7, 8], ranks_cp=3)
+    for t in [gt.tt(), tn.Tensor(gt.torch(), ranks_tucker=4, ranks_tt=5)]:
+        cp = tn.to_cp(t, 3, max_iter=200, tol=0)
+        assert all([c.dim() == 2 for c in cp.cores])
+        assert tn.relative_error(gt, cp) <= 1e-3
+
+
+def test_orthogonality_center():
+    gt = tn.rand([6, 7, 8, 9], ranks_tt=5, ranks_tucker=4)
+    t = gt.clone()
+    assert t._orthogonality_center() is None
+    t.round_tt(1e-10)
+    assert t._orthogonality_center() == 0
+    assert torch.allclose(tn.norm(t), torch.norm(gt.torch()))
+    t.round_tt(1e-10)  # Truncates from left to right, without reorthogonalizing
+    assert t._orthogonality_center() == t.dim()-1
+    assert tn.relative_error(gt, t) <= 1e-7
+    t.orthogonalize(1)
+    assert t._orthogonality_center() == 1
+    assert torch.allclose(tn.norm(t), torch.norm(gt.torch()))
+    t.cores[2] *= 2  # In-place modifications are detected
+    assert t._orthogonality_center() is None
+    assert torch.allclose(tn.norm(t), 2*torch.norm(gt.torch()))
+
+
 def test_truncated_svd():
     gt = torch.rand((2, 32, 32))
     u, v = tn.truncated_svd(gt, batch=True)
@@ -38,6 +65,63 @@ def test_truncated_svd_eig():
         assert torch.allclose(v1, v[i])
 
 
+def test_svd_algorithms():
+    gt = tn.rand([64]*4, ranks_tt=5)
+    full = gt.torch()
+    for algorithm in ('svd', 'eig', 'randomized', 'auto'):
+        t = tn.Tensor(full, ranks_tt=5, algorithm=algorithm)
+        assert tn.relative_error(gt, t) <= 1e-6
+        assert max(t.ranks_tt) <= 5
+
+    # Tall and skinny unfolding, low rank
+    M = torch.rand(1000, 6).matmul(torch.rand(6, 60))
+    for algorithm in ('randomized', 'auto'):
+        u, v = tn.truncated_svd(M, rmax=6, algorithm=algorithm)
+        assert u.shape[1] == 6
+        assert torch.norm(M - u.matmul(v)) <= 1e-8 * torch.norm(M)
+
+    tn.set_svd_algorithm('eig')
+    try:
+        assert tn.get_svd_algorithm() == 'eig'
+        t = gt + gt
+        t.round_tt(1e-8)
+        assert tn.relative_error(2*full, t) <= 1e-6
+    finally:
+        tn.set_svd_algorithm('svd')
+
+
+
+def test_svd_algorithm_eps_only():
+    # Every global backend works for truncations that are given an error bound but no maximal rank
+    gt = tn.rand([10]*4, ranks_tt=3, ranks_tucker=2)
+    full = gt.torch()
+    try:
+        for algorithm in ('svd', 'eig', 'randomized', 'auto'):
+            tn.set_svd_algorithm(algorithm)
+            u, v = tn.truncated_svd(full.reshape(100, 100), eps=1e-8)
+            assert torch.norm(full.reshape(100, 100) - u.matmul(v)) <= 1e-6 * torch.norm(full)
+            assert tn.relative_error(full, tn.Tensor(full, eps=1e-8)) <= 1e-6
+            for method in ('round_tt', 'round_tucker', 'round'):
+                t = gt + gt
+                getattr(t, method)(eps=1e-8)
+                assert tn.relative_error(2*full, t) <= 1e-6
+    finally:
+        tn.set_svd_algorithm('svd')
+
+def test_batch_round_tt():
+    shape = [6, 7, 8, 9]
+    gt = torch.stack([tn.rand(shape, ranks_tt=r).torch() for r in (1, 2, 3)])
+    # The Gram matrix squares the singular values, so 'eig' only resolves relative errors down to about 1e-8
+    for algorithm, eps in (('svd', 1e-8), ('eig', 1e-6)):
+        t = tn.Tensor(gt, batch=True)
+        t.round_tt(eps, algorithm=algorithm)
+        assert max(t.ranks_tt) <= 3  # Padded to the largest rank in the batch
+        assert torch.all(tn.relative_error(gt, t) <= 1e-5)
+        t = tn.Tensor(gt, batch=True)
+        t.round_tt(0.1)
+        assert torch.all(tn.relative_error(gt, t) <= 0.1)
+
+
 def test_round_tt_svd():
 
     for i in range(100):
@@ -66,3 +150,94 @@ def test_round_tucker():
             t = gt.clone()
             t.round_tucker(eps=eps)
             assert tn.relative_error(gt, t) <= eps
+
+
+def test_round_tucker_implicit_identity():
+    # Modes without factors: no I x I identity is formed, only the truncated factor
+    gt = tn.rand([100000, 5, 6], ranks_tt=3)
+    for method in ('round_tucker', 'round'):
+        t = gt.clone()
+        getattr(t, method)(eps=1e-10)
+        assert t.Us[0].shape == (100000, 3)
+        assert tn.relative_error(gt, t) <= 1e-7  # Inner-product based, so its round-off is around 1e-8
+
+
+def test_round_tucker_randomized():
+    torch.manual_seed(0)
+    gt = tn.rand([10, 20000, 10], ranks_tt=10, ranks_tucker=3)
+    for algorithm in ('randomized', 'auto'):
+        t = gt.clone()
+        t.round_tucker(eps=1e-10, rmax=3, algorithm=algorithm)  # Mode 1 is sketched
+        assert t.Us[1].shape == (20000, 3)
+        assert tn.relative_error(gt, t) <= 1e-7  # Inner-product based, so its round-off is around 1e-8
+    t = tn.Tensor(gt.torch(), ranks_tucker=3, algorithm='randomized')
+    assert tn.relative_error(gt.torch(), t) <= 1e-8
+
+
+def test_round():
+    for i in range(20):
+        eps = np.random.rand()**2
+        gt = tn.rand([16]*4, ranks_tt=6, ranks_tucker=6)
+        t = tn.round(gt, eps=eps)
+        assert tn.relative_error(gt, t) <= eps
+
+    # Redundant TT and Tucker ranks are both removed in one sweep
+    gt = tn.rand([10]*4, ranks_tt=3, ranks_tucker=2)
+    t = tn.round(gt + gt, eps=1e-10)
+    assert tn.relative_error(2*gt.torch(), t) <= 1e-8
+    assert max(t.ranks_tt) <= 3
+    assert max(t.ranks_tucker) <= 2
+
+    # Rank limits per TT bond and per Tucker mode, and Tucker truncation restricted to some modes
+    gt = tn.rand([10]*4, ranks_tt=5, ranks_tucker=4)
+    t = tn.round(gt, rmax=[2, 3, 4], rmax_tucker=[1, 2, 3, 4])
+    assert np.all(t.ranks_tt[1:-1] <= [2, 3, 4])
+    assert np.all(t.ranks_tucker <= [1, 2, 3, 4])
+    t = tn.round(gt, rmax_tucker=2, dim=[0])
+    assert np.array_equal(t.ranks_tucker, [2, 4, 4, 4])
+
+    # The error budget is tracked from the discarded singular values, so it holds for every input. Below 1e-6,
+    # tn.relative_error() between two compressed tensors is dominated by its own round-off
+    for i in range(20):
+        eps = 10.**np.random.uniform(-6, -1)
+        gt = tn.rand(np.random.randint(2, 10, 5), ranks_tt=np.random.randint(1, 6))
+        gt = gt + gt*np.random.rand()
+        t = tn.round(gt, eps=eps)
+        assert tn.relative_error(gt, t) <= eps
+
+
+def test_auto_round():
+
+    shape = [8]*6
+    t1 = tn.rand(shape, ranks_tt=4)
+    t2 = tn.rand(shape, ranks_tt=4)
+    t3 = tn.rand(shape, ranks_tt=[3, None, None, 2, 2], ranks_cp=[None, None, 3, None, None, None])
+    gt = t1.torch()*t2.torch() + t3.torch() - t1.torch()
+
+    with tn.auto_round(eps=1e-10):
+        t = t1*t2 + t3 - t1
+    assert tn.relative_error(gt, t) <= 1e-8
+    assert max((t1*t2).ranks_tt) == 16
+
+    # Randomized path: t1*t1 has formal rank 16 but true rank at most 10
+    with tn.auto_round(eps=1e-10, rmax=10, oversampling=2):
+        t = t1*t1
+        t = t + 2*t
+    assert tn.relative_error(3*t1.torch()**2, t) <= 1e-8
+    assert max(t.ranks_tt) <= 10
+
+    # Tucker operands take the randomized path too: their factors are absorbed, and the result is a TT tensor
+    t4 = tn.rand(shape, ranks_tt=4, ranks_tucker=3)
+    with tn.auto_round(eps=1e-10, rmax=10, oversampling=2):
+        t = t4*t4
+    assert tn.relative_error(t4.torch()**2, t) <= 1e-8
+    assert max(t.ranks_tt) <= 10
+    assert all([U is None for U in t.Us])
+
+    # Policies do not leak into other threads
+    seen = []
+    with tn.auto_round(eps=1e-10):
+        thread = threading.Thread(target=lambda: seen.append(tn.auto_round.active()))
+        thread.start()
+        thread.join()
+    assert seen == [None]
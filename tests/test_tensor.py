@@ -14,6 +14,15 @@ def test_tensor():
         assert torch.allclose(c.torch(), b.torch()[i])
 
 
+    # Batch cores are not aliased across batch elements
+    a = torch.rand(3, 6, 5, 2)
+    for t in [tn.Tensor(a, batch=True), tn.Tensor(a, batch=True)[:, :, :, :, None]]:
+        x = t.torch()
+        for core in t.cores:
+            assert 0 not in core.stride()
+            core[0] += 1
+        assert torch.allclose(t.torch()[1:], x[1:])
+
 def test_tt_tensor():
     a = torch.rand(10, 5, 5, 5, 5)
     b = tn.Tensor(a, ranks_tt=3, batch=True)
@@ -51,6 +60,23 @@ def test_cp_tensor():
         assert torch.norm(c.torch() - b.torch()[i]) < 1e1 # Due to random initialization
 
 
+def test_mttkrp():
+    a = torch.rand(4, 5, 6, 7)
+    factors = [torch.rand(sh, 3) for sh in a.shape]
+    for n in range(a.dim()):
+        idxs = 'abcd,' + ','.join(['{}r'.format('abcd'[m]) for m in range(a.dim()) if m != n]) + '->{}r'.format('abcd'[n])
+        gt = torch.einsum(idxs, [a] + [factors[m] for m in range(a.dim()) if m != n])
+        assert torch.allclose(tn.tensor._mttkrp(a, factors, n), gt, rtol=1e-4)
+        batch = tn.tensor._mttkrp(torch.stack([a, 2 * a]), [torch.stack([f, f]) for f in factors], n, batch=True)
+        assert torch.allclose(batch[0], gt, rtol=1e-4)
+        assert torch.allclose(batch[1], 2 * gt, rtol=1e-4)
+
+    # CP-ALS should recover an exact low-rank tensor
+    a = tn.rand([6, 7, 8], ranks_cp=2).torch()
+    t = tn.Tensor(a, ranks_cp=2, max_iter=100, tol=0)
+    assert tn.relative_error(a, t) < 1e-2
+
+
 def test_tucker_tensor():
     a = torch.rand(10, 5, 5, 5, 5)
     b = tn.Tensor(a, ranks_tucker=3, batch=True)
@@ -1,3 +1,4 @@
+from pytest import raises
 import numpy as np
 import tntorch as tn
 import torch
@@ -27,3 +28,91 @@ def test_cumsum():
         shape = np.random.randint(1, 10, N)
         t = tn.rand(shape, ranks_tt=2, ranks_tucker=2)
         assert np.linalg.norm(tn.cumsum(t, modes).numpy() - np.cumsum(t.numpy(), *modes)) <= 1e-7
+
+
+def test_stack():
+
+    shape = [5, 6, 7]
+    ts = [tn.rand(shape, ranks_tt=2), tn.rand(shape, ranks_tt=4, ranks_tucker=3), tn.rand(shape, ranks_cp=3),
+          tn.rand(shape, ranks_tt=1)]
+    t = tn.stack(ts)
+    assert t.batch
+    full = t.torch()
+    for k in range(len(ts)):
+        assert torch.norm(full[k] - ts[k].torch()) <= 1e-7 * torch.norm(ts[k].torch())
+    assert torch.allclose(tn.norm(t), torch.tensor([tn.norm(x) for x in ts]))
+
+    ts2 = t.unbind_batch()
+    for k in range(len(ts)):
+        assert tn.relative_error(ts[k], ts2[k]) <= 1e-7
+    assert np.array_equal(ts2[0].ranks_tt, ts[0].ranks_tt)
+    assert np.array_equal(ts2[3].ranks_tt, ts[3].ranks_tt)
+
+    # Mixed CP and TT cores, both with Tucker factors
+    ts = [tn.rand(shape, ranks_tt=2, ranks_tucker=3), tn.rand(shape, ranks_cp=3, ranks_tucker=3)]
+    t = tn.stack(ts)
+    assert all([U is not None for U in t.Us])
+    full = t.torch()
+    for k in range(len(ts)):
+        assert torch.norm(full[k] - ts[k].torch()) <= 1e-7 * torch.norm(ts[k].torch())
+
+
+def test_dct():
+    x = torch.rand(3, 17, 4)
+    U = tn.generate_basis('dct', (17, 17))
+    assert torch.allclose(U.t().matmul(U), torch.eye(17))
+    assert torch.allclose(tn.dct(x, dim=1), torch.einsum('aib,ik->akb', (x, U)))
+    assert torch.allclose(tn.dct(tn.dct(x, dim=1), dim=1, inverse=True), x)
+
+
+def test_spectral_tucker():
+    x = torch.linspace(0, 1, 200)
+    gt = tn.Tensor(torch.cos(x[:, None, None] + 2*x[None, :, None]**2 + x[None, None, :20]), ranks_tt=3)
+    t = tn.spectral_tucker(gt, [30, 30, None])
+    assert t.Us[0].shape == (200, 30)
+    assert t.Us[2] is None
+    assert tn.relative_error(gt, t) <= 1e-2
+    # Same projection, whether or not the tensor already has factors. Compared densely: tn.relative_error() works
+    # through inner products, so its own round-off is around 1e-8
+    t1 = tn.Tensor(gt.torch(), ranks_tucker=8)
+    t2 = t1.decompress_tucker_factors()
+    x1 = tn.spectral_tucker(t1, 30).torch()
+    x2 = tn.spectral_tucker(t2, 30).torch()
+    assert torch.norm(x1 - x2) <= 1e-10 * torch.norm(x1)
+
+    # Chebyshev basis: a quadratic at the Chebyshev nodes has 3 coefficients
+    nodes = torch.cos(np.pi * (2*torch.arange(50.) + 1) / 100)
+    gt = tn.Tensor(nodes[:, None]**2 + nodes[None, :])
+    t = tn.spectral_tucker(gt, 3, basis='chebyshev')
+    assert torch.allclose(t.Us[0][:, 2], 2*nodes**2 - 1)
+    assert torch.norm(t.torch() - gt.torch()) <= 1e-10 * torch.norm(gt.torch())
+
+    # Batch factors are not aliased across batch elements
+    t = tn.spectral_tucker(tn.rand([3, 10, 10], ranks_tt=2, batch=True), 4)
+    assert 0 not in t.Us[0].stride()
+
+
+def test_shared_cores():
+    # Results share the nodes an operation leaves untouched (copy-on-write)
+    U = torch.rand(4, 5)
+    ops = [lambda t: tn.ttm(t, U, dim=2), lambda t: tn.flip(t, 1), lambda t: tn.cumsum(t, 2), lambda t: 2*t,
+           lambda t: tn.pad(t, 7, dim=0), lambda t: tn.cat([t], dim=3), lambda t: t.decompress_tucker_factors(dim=0),
+           lambda t: t.repeat(1, 1, 1, 1, 1, 2), lambda t: tn.partial(t, 3), lambda t: tn.transpose(t)]
+    for op in ops:
+        t = tn.rand([5]*6, ranks_tt=3, ranks_tucker=2)
+        gt = t.torch()
+        t2 = op(t)
+        shared = [n for n in range(t.dim()) if any([t2.cores[n].data_ptr() == c.data_ptr() for c in t.cores])]
+        assert len(shared) >= t.dim()-1
+        t2._writable(shared[0])[:] = 0  # Library writes copy the node first
+        assert torch.equal(t.torch(), gt)
+        t2.cores[shared[1]].mul_(2)  # Other in-place writes are detected
+        with raises(RuntimeError):
+            t.torch()
+        with raises(RuntimeError):
+            t2.torch()
+
+    t = tn.rand([5]*6, ranks_tt=3)
+    t2 = tn.round_tt(t, eps=1e-10)  # All cores are replaced: nothing is shared anymore
+    t2.cores[0][:] = 0
+    tn.norm(t)
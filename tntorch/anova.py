@@ -21,18 +21,23 @@ def anova_decomposition(t, marginals=None):
     for n in range(t.dim()):
         if marginals[n] is None:
             marginals[n] = torch.ones([t.shape[n]]) / float(t.shape[n])
-    cores = [c.clone() for c in t.cores]
+    cores = list(t.cores)
     Us = []
     idxs = []
     for n in range(t.dim()):
-        if t.Us[n] is None:
-            U = torch.eye(t.shape[n])
+        pmf = marginals[n][:, None] / torch.sum(marginals[n])
+        if t.Us[n] is None:  # Implicit identity factor: the core's slices are transformed instead
+            expected = torch.sum(cores[n] * pmf, dim=-2, keepdim=True)
+            cores[n] = torch.cat((expected, cores[n]-expected), dim=-2)
+            Us.append(None)
         else:
             U = t.Us[n]
-        expected = torch.sum(U * (marginals[n][:, None] / torch.sum(marginals[n])), dim=0, keepdim=True)
-        Us.append(torch.cat((expected, U-expected), dim=0))
+            expected = torch.sum(U * pmf, dim=0, keepdim=True)
+            Us.append(torch.cat((expected, U-expected), dim=0))
         idxs.append([0] + [1]*t.shape[n])
-    return tn.Tensor(cores, Us, idxs=idxs)
+    result = tn.Tensor(cores, Us, idxs=idxs)
+    result._share(t)  # Cores of Tucker modes are shared (copy-on-write)
+    return result
 
 
 def undo_anova_decomposition(a):
@@ -51,9 +56,11 @@ def undo_anova_decomposition(a):
             cores.append(a.cores[n][..., 1:, :] + a.cores[n][..., 0:1, :])
             Us.append(None)
         else:
-            cores.append(a.cores[n].clone())
+            cores.append(a.cores[n])
             Us.append(a.Us[n][1:, :] + a.Us[n][0:1, :])
-    return tn.Tensor(cores, Us=Us)
+    result = tn.Tensor(cores, Us=Us)
+    result._share(a)  # Cores of Tucker modes are shared (copy-on-write)
+    return result
 
 
 def truncate_anova(t, mask, keepdim=False, marginals=None):
@@ -107,20 +114,20 @@ def sobol(t, mask, marginals=None, normalize=True):
     a -= tn.Tensor([torch.cat((torch.ones(1, 1, 1),
                                torch.zeros(1, sh-1, 1)), dim=1)
                     for sh in a.shape])*a[(0,)*t.dim()]  # Set empty tuple to 0
-    am = a.clone()
+    am = a._shallow_copy()
     for n in range(t.dim()):
         if marginals[n] is None:
             m = torch.ones([t.shape[n]])
         else:
             m = marginals[n]
         m /= torch.sum(m)  # Make sure each marginal sums to 1
-        if am.Us[n] is None:
+        if am.Us[n] is None:  # Nodes are copied on write (see :meth:`tensor.Tensor._writable()`)
             if am.cores[n].dim() == 3:
-                am.cores[n][:, 1:, :] *= m[None, :, None]
+                am._writable(n)[:, 1:, :] *= m[None, :, None]
             else:
-                am.cores[n][1:, :] *= m[:, None]
+                am._writable(n)[1:, :] *= m[:, None]
         else:
-            am.Us[n][1:, :] *= m[:, None]
+            am._writable(n, factor=True)[1:, :] *= m[:, None]
     am_masked = tn.mask(am, mask)
     if am_masked.cores[-1].shape[-1] > 1:
         am_masked.cores.append(torch.eye(am_masked.cores[-1].shape[-1])[:, :, None])
@@ -2,11 +2,13 @@ import tntorch as tn
 import torch
 import sys
 import time
+import threading
+import concurrent.futures
 import numpy as np
 import logging
 
 
-def minimum(tensors=None, function=lambda x: x, rmax=10, max_iter=10, verbose=False, batch=False, **kwargs):
+def minimum(tensors=None, function=lambda x: x, rmax=10, max_iter=10, verbose=False, batch=False, n_starts=1, n_workers=1, seed=None, **kwargs):
     """
     Estimate the minimal element of a tensor (or a function of one or several tensors)
 
@@ -15,30 +17,43 @@ def minimum(tensors=None, function=lambda x: x, rmax=10, max_iter=10, verbose=Fa
     :param max_iter: used for :func:`cross.cross()`. Lower is faster; higher is more accurate (default is 10)
     :param verbose: default is False
     :param batch: Boolean
+    :param n_starts: number of independent (randomly initialized) minimizations to run. Default is 1
+    :param n_workers: how many of those minimizations may run concurrently. Default is 1
+    :param seed: optional integer seed that makes the starts reproducible
     :param **kwargs: passed to :func:`cross.cross()`
 
     :return: a scalar
     """
 
-    _, info = cross(**kwargs, tensors=tensors, function=function, rmax=rmax, max_iter=max_iter, verbose=verbose, return_info=True, _minimize=True, batch=batch)
-    return info['min']
+    _, values = _multistart_minimize(tensors=tensors, function=function, n_starts=n_starts, n_workers=n_workers,
+                                     seed=seed, k=1, rmax=rmax, max_iter=max_iter, verbose=verbose, batch=batch, **kwargs)
+    return values[0]
     # return t[argmin(rmax=rmax, max_iter=max_iter, verbose=verbose, **kwargs)]
 
 
-def argmin(tensors=None, function=lambda x: x, rmax=10, max_iter=10, verbose=False, batch=False, **kwargs):
+def argmin(tensors=None, function=lambda x: x, rmax=10, max_iter=10, verbose=False, batch=False, n_starts=1, n_workers=1, seed=None, k=None, **kwargs):
     """
     Estimate the minimizer of a tensor (position where its minimum is located).
 
-    For arguments, see :func:`cross.minimum()`
+    :Example:
+
+    >>> positions, values = tn.argmin(t, n_starts=20, n_workers=4, k=5)  # The 5 best candidates found by 20 runs
+
+    For the other arguments, see :func:`cross.minimum()`
+
+    :param k: if given, the `k` best distinct candidates found over all starts are returned, together with their values
 
-    :return: a tuple
+    :return: a tuple (if `k` is None), otherwise a list of `k` tuples and a vector with their values (in increasing order)
     """
 
-    _, info = cross(**kwargs, tensors=tensors, function=function, rmax=rmax, max_iter=max_iter, verbose=verbose, return_info=True, _minimize=True)
-    return info['argmin']
+    positions, values = _multistart_minimize(tensors=tensors, function=function, n_starts=n_starts, n_workers=n_workers,
+                                             seed=seed, k=1 if k is None else k, rmax=rmax, max_iter=max_iter, verbose=verbose, **kwargs)
+    if k is None:
+        return positions[0]
+    return positions, values
 
 
-def maximum(tensors=None, function=lambda x: x, rmax=10, max_iter=10, verbose=False, batch=False, **kwargs):
+def maximum(tensors=None, function=lambda x: x, rmax=10, max_iter=10, verbose=False, batch=False, n_starts=1, n_workers=1, seed=None, **kwargs):
     """
     Estimate the maximal element of a tensor.
 
@@ -47,24 +62,107 @@ def maximum(tensors=None, function=lambda x: x, rmax=10, max_iter=10, verbose=Fa
     :return: a scalar
     """
 
-    _, info = cross(**kwargs, function=lambda *x: -function(*x), tensors=tensors, rmax=rmax, max_iter=max_iter, verbose=verbose, return_info=True, _minimize=True)
-    return -info['min']
+    _, values = _multistart_minimize(tensors=tensors, function=lambda *x: -function(*x), n_starts=n_starts, n_workers=n_workers,
+                                     seed=seed, k=1, rmax=rmax, max_iter=max_iter, verbose=verbose, **kwargs)
+    return -values[0]
 
 
-def argmax(tensors=None, function=lambda x: x, rmax=10, max_iter=10, verbose=False, batch=False, **kwargs):
+def argmax(tensors=None, function=lambda x: x, rmax=10, max_iter=10, verbose=False, batch=False, n_starts=1, n_workers=1, seed=None, k=None, **kwargs):
     """
     Estimate the maximizer of a tensor (position where its maximum is located).
 
-    For arguments, see :func:`cross.minimum()`
+    For arguments, see :func:`cross.argmin()`
+
+    :return: a tuple (if `k` is None), otherwise a list of `k` tuples and a vector with their values (in decreasing order)
+    """
+
+    positions, values = _multistart_minimize(tensors=tensors, function=lambda *x: -function(*x), n_starts=n_starts, n_workers=n_workers,
+                                             seed=seed, k=1 if k is None else k, rmax=rmax, max_iter=max_iter, verbose=verbose, **kwargs)
+    if k is None:
+        return positions[0]
+    return positions, -values
+
+
+def _multistart_minimize(n_starts=1, n_workers=1, seed=None, k=1, **kwargs):
+    """
+    Runs one or several cross-approximation minimizations and gathers the best candidates found.
+
+    When there are several starts, they run in a thread pool (PyTorch releases the GIL in its kernels, and
+    arbitrary functions and closures can be used without pickling them). All starts share the best value found so
+    far: it shifts the function transform of every run, and a start whose own best stops improving while lagging
+    behind it is pruned.
+
+    :param n_starts: number of independent starts
+    :param n_workers: number of concurrent threads
+    :param seed: optional integer seed
+    :param k: number of candidates to return
+    :param kwargs: passed to :func:`cross.cross()`
+
+    :return: a list of `k` (or fewer) positions, and a PyTorch vector with their values in increasing order
+    """
 
-    :return: a tuple
+    assert n_starts >= 1
+    assert n_workers >= 1
+
+    if n_starts == 1:
+        incumbent = None
+        seeds = [seed]
+    else:
+        incumbent = {'min': None, 'lock': threading.Lock()}
+        seeds = np.random.RandomState(seed).randint(0, np.iinfo(np.int32).max, n_starts)
+
+    single = n_starts == 1 and k == 1  # The run's own best sample is the answer: no candidates are gathered
+
+    def run(s):
+        _, info = cross(**kwargs, return_info=True, _minimize=True, _seed=s, _incumbent=incumbent,
+                        _candidates=0 if single else k)
+        return info
+
+    if n_workers > 1 and n_starts > 1:
+        with concurrent.futures.ThreadPoolExecutor(max_workers=n_workers) as executor:
+            infos = list(executor.map(run, seeds))
+    else:
+        infos = [run(s) for s in seeds]
+    if single:
+        return [tuple(int(i) for i in infos[0]['argmin'])], torch.tensor([float(infos[0]['min'])])
+
+    candidates = {}
+    for info in infos:
+        for position, value in info['candidates'].items():
+            if position not in candidates or value < candidates[position]:
+                candidates[position] = value
+        position = tuple(int(i) for i in info['argmin'])
+        candidates[position] = min(candidates.get(position, float('inf')), float(info['min']))
+    best = sorted(candidates.items(), key=lambda item: item[1])[:k]
+    return [position for position, value in best], torch.tensor([value for position, value in best])
+
+
+def _evaluate_points(cores, Xs):
     """
+    Evaluates a tensor network given by CP and/or TT cores (no Tucker factors) at a set of points.
 
-    _, info = cross(**kwargs, tensors=tensors, function=lambda *x: -function(*x), rmax=rmax, max_iter=max_iter, verbose=verbose, return_info=True, _minimize=True)
-    return info['argmin']
+    All points are pushed through the network at once, so the cost is one batched contraction per core.
 
+    :param cores: a list of :math:`N` CP factors or TT cores
+    :param Xs: a list of :math:`N` index vectors of length :math:`P` each
 
-def cross(function=lambda x: x, domain=None, tensors=None, function_arg='vectors', ranks_tt=None, kickrank=3, rmax=100, eps=1e-6, max_iter=25, val_size=1000, verbose=True, return_info=False, record_samples=False, _minimize=False, device=None, batch=False, suppress_warnings=False, detach_evaluations=False):
+    :return: a PyTorch vector of length :math:`P`
+    """
+
+    L = None
+    for n, core in enumerate(cores):
+        if core.dim() == 3:  # TT core
+            if L is None:
+                L = torch.ones(len(Xs[n]), core.shape[0], device=core.device)
+            L = torch.einsum('pi,ipj->pj', (L, core[:, Xs[n], :]))
+        else:  # CP factor
+            if L is None:
+                L = torch.ones(len(Xs[n]), core.shape[1], device=core.device)
+            L = L*core[Xs[n], :]
+    return torch.sum(L, dim=1)
+
+
+def cross(function=lambda x: x, domain=None, tensors=None, function_arg='vectors', ranks_tt=None, kickrank=3, rmax=100, eps=1e-6, max_iter=25, val_size=1000, verbose=True, return_info=False, record_samples=False, _minimize=False, device=None, batch=False, suppress_warnings=False, detach_evaluations=False, validation='random', tol=None, _seed=None, _incumbent=None, _candidates=0):
     """
     Cross-approximation routine that samples a black-box function and returns an N-dimensional tensor train approximating it. It accepts either:
 
@@ -98,6 +196,13 @@ def cross(function=lambda x: x, domain=None, tensors=None, function_arg='vectors
     :param eps: the procedure will stop after this validation error is met (as measured after each iteration)
     :param max_iter: int
     :param val_size: size of the validation set
+    :param validation: how the validation error is measured after each iteration:
+
+        - 'random' (default): `function` is evaluated once on `val_size` random points
+        - 'samples': up to `val_size` samples taken during each left-to-right half-sweep are reused (they lie off the final pivots). This costs no extra function evaluations, but the estimate is usually a bit optimistic
+        - a pair (Xs, ys), where Xs is a :math:`P \\times N` matrix of indices and ys contains the :math:`P` corresponding ground-truth values
+
+    :param tol: if given, the procedure will also stop when the validation error changes by less than this amount (in absolute value) between two consecutive iterations. With `validation='samples'`, both errors are measured on the previous iteration's samples, since the set changes at every iteration (default is None)
     :param verbose: default is True
     :param return_info: if True, will also return a dictionary with informative metrics about the algorithm's outcome
     :param device: PyTorch device
@@ -114,6 +219,10 @@ def cross(function=lambda x: x, domain=None, tensors=None, function_arg='vectors
         raise ModuleNotFoundError("Functions that require cross-approximation require the optional maxvolpy package, which can be installed by 'pip install maxvolpy'. More info is available at https://bitbucket.org/muxas/maxvolpy")
 
     assert domain is not None or tensors is not None
+    if _seed is None:
+        rng = np.random
+    else:
+        rng = np.random.RandomState(_seed)
     assert function_arg in ('vectors', 'matrix')
     if function_arg == 'matrix':
         def f(*args):
@@ -163,7 +272,7 @@ def cross(function=lambda x: x, domain=None, tensors=None, function_arg='vectors
 
     # Prepare left and right sets
     lsets = [np.array([[0]])] + [None]*(N-1)
-    randint = np.hstack([np.random.randint(0, Is[n+1], [max(Rs), 1]) for n in range(N-1)] + [np.zeros([max(Rs), 1], dtype=np.int)])
+    randint = np.hstack([rng.randint(0, Is[n+1], [max(Rs), 1]) for n in range(N-1)] + [np.zeros([max(Rs), 1], dtype=np.int)])
     rsets = [randint[:Rs[n+1], n:] for n in range(N-1)] + [np.array([[0]])]
 
     # Initialize left and right interfaces for `tensors`
@@ -187,14 +296,28 @@ def cross(function=lambda x: x, domain=None, tensors=None, function_arg='vectors
     t_linterfaces, t_rinterfaces = init_interfaces()
 
     # Create a validation set
-    Xs_val = [torch.as_tensor(np.random.choice(I, int(val_size))).to(device) for I in Is]
-    ys_val = f(*[t[Xs_val].torch() for t in tensors])
-    if ys_val.dim() > 1:
-        assert ys_val.dim() == 2
-        assert ys_val.shape[1] == 1
-        ys_val = ys_val[:, 0]
-    assert len(ys_val) == val_size
-    norm_ys_val = torch.norm(ys_val)
+    if isinstance(validation, str):
+        assert validation in ('random', 'samples')
+    if validation == 'random':
+        Xs_val = [torch.as_tensor(rng.choice(I, int(val_size))).to(device) for I in Is]
+        ys_val = f(*[t[Xs_val].torch() for t in tensors])
+    elif validation == 'samples':  # Will be gathered during the sweeps
+        Xs_val = None
+        ys_val = None
+        previous_val = None  # The previous iteration's set, to measure changes in the error (see `tol`)
+    else:
+        Xs_val, ys_val = validation
+        Xs_val = torch.as_tensor(Xs_val).long()
+        Xs_val = [Xs_val[:, n].to(device) for n in range(N)]
+        ys_val = torch.as_tensor(ys_val, dtype=torch.get_default_dtype()).to(device)
+        val_size = len(ys_val)
+    if ys_val is not None:
+        if ys_val.dim() > 1:
+            assert ys_val.dim() == 2
+            assert ys_val.shape[1] == 1
+            ys_val = ys_val[:, 0]
+        assert len(ys_val) == val_size
+        norm_ys_val = torch.norm(ys_val)
 
     if verbose:
         print('Cross-approximation over a {}D domain containing {:g} grid points:'.format(N, tensors[0].numel()))
@@ -206,7 +329,8 @@ def cross(function=lambda x: x, domain=None, tensors=None, function_arg='vectors
         'eval_time': 0,
         'val_epss': [],
         'min': 0,
-        'argmin': None
+        'argmin': None,
+        'candidates': {}
     }
     if record_samples:
         info['sample_positions'] = torch.zeros(0, N).to(device)
@@ -228,10 +352,19 @@ def cross(function=lambda x: x, domain=None, tensors=None, function_arg='vectors
             info['sample_values'] = torch.cat((info['sample_values'], evaluation))
         info['eval_time'] += time.time() - eval_start
         if _minimize:
-            evaluation = np.pi/2 - torch.atan((evaluation - info['min']))  # Function used by I. Oseledets for TT minimization in ttpy
+            if _candidates > 0:  # Remember the best few samples of this fiber
+                flat = evaluation.flatten()
+                best = torch.topk(-flat, min(_candidates, len(flat)))[1]
+                for position, value in zip(fiber_positions(j)[best.cpu().numpy()], flat[best]):
+                    position = tuple(int(p) for p in position)
+                    info['candidates'][position] = min(info['candidates'].get(position, float('inf')), value.item())
+            shift = info['min']
+            if _incumbent is not None and _incumbent['min'] is not None and (info['argmin'] is None or _incumbent['min'] < shift):
+                shift = _incumbent['min']  # Focus on values below the best found by any start
+            evaluation = np.pi/2 - torch.atan((evaluation - shift))  # Function used by I. Oseledets for TT minimization in ttpy
             evaluation_argmax = torch.argmax(evaluation)
-            eval_min = torch.tan(np.pi/2 - evaluation[evaluation_argmax]) + info['min']
-            if info['min'] == 0 or eval_min < info['min']:
+            eval_min = torch.tan(np.pi/2 - evaluation[evaluation_argmax]) + shift
+            if info['argmin'] is None or eval_min < info['min']:
                 coords = np.unravel_index(evaluation_argmax, [Rs[j], Is[j], Rs[j + 1]])
                 info['min'] = eval_min
                 info['argmin'] = tuple(lsets[j][coords[0]][1:]) + tuple([coords[1]]) + tuple(rsets[j][coords[2]][:-1])
@@ -249,6 +382,15 @@ def cross(function=lambda x: x, domain=None, tensors=None, function_arg='vectors
         info['nsamples'] += V.numel()
         return V
 
+    def fiber_positions(j):  # Global indices of the Rs[j] x Is[j] x Rs[j+1] samples drawn by `evaluate_function(j)`
+        left = lsets[j][:, 1:]
+        right = rsets[j][:, :-1]
+        return np.hstack([
+            np.repeat(left, Is[j]*Rs[j+1], axis=0),
+            np.tile(np.repeat(np.arange(Is[j]), Rs[j+1]), Rs[j])[:, None],
+            np.tile(right, (Rs[j]*Is[j], 1))
+        ])
+
     # Sweeps
     for i in range(max_iter):
 
@@ -257,12 +399,18 @@ def cross(function=lambda x: x, domain=None, tensors=None, function_arg='vectors
             sys.stdout.flush()
 
         left_locals = []
+        val_samples = []
+        previous_min = info['min']
 
         # Left-to-right
         for j in range(N-1):
 
             # Update tensors for current indices
             V = evaluate_function(j)
+            if validation == 'samples':  # Keep a random subset of this fiber for validation
+                positions = fiber_positions(j)
+                keep = rng.choice(len(positions), min(len(positions), int(val_size)), replace=False)
+                val_samples.append((positions[keep], V.flatten()[torch.as_tensor(keep)]))
 
             # QR + maxvol towards the right
             V = torch.reshape(V, [-1, V.shape[2]])  # Left unfolding
@@ -314,10 +462,39 @@ def cross(function=lambda x: x, domain=None, tensors=None, function_arg='vectors
         cores[0] = V
 
         # Evaluate validation error
-        val_eps = torch.norm(ys_val - tn.Tensor(cores)[Xs_val].torch()) / norm_ys_val
+        if validation == 'samples' and len(val_samples) > 0:
+            if Xs_val is not None:
+                previous_val = (Xs_val, ys_val, norm_ys_val)
+            positions = np.concatenate([sample[0] for sample in val_samples], axis=0)
+            values = torch.cat([sample[1] for sample in val_samples])
+            keep = rng.choice(len(positions), min(len(positions), int(val_size)), replace=False)
+            Xs_val = [torch.as_tensor(positions[keep, n]).to(device) for n in range(N)]
+            ys_val = values[torch.as_tensor(keep)]
+            norm_ys_val = torch.norm(ys_val)
+        if ys_val is None:  # N = 1: the approximation interpolates all samples
+            val_eps = torch.zeros([])
+        else:
+            val_eps = torch.norm(ys_val - _evaluate_points(cores, Xs_val)) / norm_ys_val
         info['val_epss'].append(val_eps)
+        stagnated = False
+        pruned = False
         if val_eps < eps:
             converged = True
+        elif tol is not None and len(info['val_epss']) >= 2:
+            change = val_eps - info['val_epss'][-2]
+            if validation == 'samples' and previous_val is not None:  # Compare on the same set
+                Xs_prev, ys_prev, norm_ys_prev = previous_val
+                change = torch.norm(ys_prev - _evaluate_points(cores, Xs_prev)) / norm_ys_prev - info['val_epss'][-2]
+            if abs(change) < tol:
+                converged = True
+                stagnated = True
+        if _incumbent is not None:  # Multi-start minimization: share our best value, or give up if hopeless
+            with _incumbent['lock']:
+                if _incumbent['min'] is None or info['min'] < _incumbent['min']:
+                    _incumbent['min'] = info['min']
+                elif i > 0 and info['min'] >= previous_min:
+                    converged = True
+                    pruned = True
 
         if verbose:  # Print status
             if _minimize:
@@ -325,7 +502,11 @@ def cross(function=lambda x: x, domain=None, tensors=None, function_arg='vectors
             else:
                 print('| eps: {:.3e}'.format(val_eps), end='')
             print(' | total time: {:8.4f} | largest rank: {:3d}'.format(time.time() - start, max(Rs)), end='')
-            if converged:
+            if pruned:
+                print(' <- pruned (best so far: {:.8g})'.format(_incumbent['min']))
+            elif stagnated:
+                print(' <- stagnated (tol={})'.format(tol))
+            elif converged:
                 print(' <- converged: eps < {}'.format(eps))
             elif i == max_iter-1:
                 print(' <- max_iter was reached: {}'.format(max_iter))
@@ -338,7 +519,7 @@ def cross(function=lambda x: x, domain=None, tensors=None, function_arg='vectors
             newRs[1:-1] = np.minimum(rmax, newRs[1:-1]+kickrank)
             for n in list(range(1, N)) + list(range(N-1, 0, -1)):
                 newRs[n] = min(newRs[n-1]*Is[n-1], newRs[n], Is[n]*newRs[n+1])
-            extra = np.hstack([np.random.randint(0, Is[n+1], [max(newRs), 1]) for n in range(N-1)] + [np.zeros([max(newRs), 1], dtype=np.int)])
+            extra = np.hstack([rng.randint(0, Is[n+1], [max(newRs), 1]) for n in range(N-1)] + [np.zeros([max(newRs), 1], dtype=np.int)])
             for n in range(N-1):
                 if newRs[n+1] > Rs[n+1]:
                     rsets[n] = np.vstack([rsets[n], extra[:newRs[n+1]-Rs[n+1], n:]])
@@ -84,7 +84,7 @@ def partial(t, dim, order=1, bounds=None, periodic=False, pad='top'):
     if not isinstance(pad, list):
         pad = [pad]*len(dim)
 
-    t2 = t.clone()
+    t2 = t._shallow_copy()
     for i, d in enumerate(dim):
         for o in range(1, order+1):
             if periodic[i]:
@@ -1,3 +1,4 @@
+import heapq
 import torch
 import numpy as np
 import tntorch as tn
@@ -20,6 +21,83 @@ def _process(gt, approx):
     return gt, approx
 
 
+def _is_batch(*ts):
+    """
+    Whether any of the arguments is a batch :class:`Tensor` (its decompressed version has a leading batch mode)
+    """
+
+    return any([isinstance(t, tn.Tensor) and t.batch for t in ts])
+
+
+def _batch_norm(x):
+    """
+    Norm of every element of a batch of PyTorch tensors
+    """
+
+    return torch.sqrt(torch.sum(x.reshape(x.shape[0], -1)**2, dim=1))
+
+
+def _project_spatial(core, M, batch=False):
+    """
+    Contracts the spatial mode of a TT core (or CP factor) with a matrix
+    """
+
+    b = 'b' if batch else ''
+    if core.dim() == 3 + batch:
+        return torch.einsum(b+'iak,'+b+'aj->'+b+'ijk', (core, M))
+    else:
+        return torch.einsum(b+'ak,'+b+'aj->'+b+'jk', (core, M))
+
+
+def _project_left(core, M, batch=False):
+    """
+    Contracts the left rank mode of a TT core (or CP factor) with a matrix
+    """
+
+    b = 'b' if batch else ''
+    if core.dim() == 3 + batch:
+        return torch.einsum(b+'sr,'+b+'rai->'+b+'sai', (M, core))
+    else:
+        return torch.einsum(b+'sr,'+b+'ar->'+b+'sar', (M, core))
+
+
+def _dot_step(Lprod, core1, U1, core2, U2, batch=False):
+    """
+    Advances the running factor of a dot product sweep by one dimension.
+
+    :param Lprod: running factor of shape :math:`R^2_{n-1} \\times R^1_{n-1}` (or batch of them)
+    :param core1: the current core of the first tensor
+    :param U1: its Tucker factor (or None)
+    :param core2: the current core of the second tensor
+    :param U2: its Tucker factor (or None)
+    :param batch: Boolean
+
+    :return: the running factor of shape :math:`R^2_n \\times R^1_n`
+    """
+
+    # First part: absorb Tucker factors
+    if U1 is None:
+        if U2 is not None:
+            core1 = _project_spatial(core1, U2, batch)
+    elif U2 is None:
+        core2 = _project_spatial(core2, U1, batch)
+    else:  # Both have Tucker factors
+        core2 = _project_spatial(core2, torch.matmul(U2.transpose(-1, -2), U1), batch)
+    # Second part: advance running factor `Lprod`
+    return _dot_advance(_project_left(core1, Lprod, batch), core2, batch)
+
+
+def _dot_advance(Ucore, Vcore, batch=False):
+    """
+    Contracts a core already projected on the running factor (`Ucore`) with a core of the other tensor (`Vcore`)
+    """
+
+    if Vcore.dim() == 3 + batch:
+        return torch.matmul(tn.left_unfolding(Vcore, batch=batch).transpose(-1, -2), tn.left_unfolding(Ucore, batch=batch))
+    b = 'b' if batch else ''
+    return torch.einsum(b+'as,'+b+'sar->'+b+'sr', (Vcore, Ucore))
+
+
 def dot(t1, t2, k=None):
     """
     Generalized tensor dot product: contracts the k leading dimensions of two tensors of dimension N1 and N2.
@@ -43,70 +121,198 @@ def dot(t1, t2, k=None):
     :param t2: a :class:`Tensor` (or a PyTorch tensor)
     :param k: an int (default: None)
 
+    For batch tensors, all dimensions are contracted and the result is a vector with one dot product per batch element.
+
     :return: a scalar (if k is None and t1.dim() == t2.dim()), a tensor otherwise
     """
 
-    def _project_spatial(core, M):
-        if core.dim() == 3:
-            return torch.einsum('iak,aj->ijk', (core, M))
-        else:
-            return torch.einsum('ak,aj->jk', (core, M))
-
-    def _project_left(core, M):
-        if core.dim() == 3:
-            return torch.einsum('sr,rai->sai', (M, core))
-        else:
-            return torch.einsum('sr,ar->sar', (M, core))
-
+    batch = _is_batch(t1, t2)
     t1, t2 = _process(t1, t2)
     if isinstance(t1, torch.Tensor) and isinstance(t2, torch.Tensor):
+        if batch:
+            return torch.sum((t1*t2).reshape(t1.shape[0], -1), dim=1)
         return t1.flatten().dot(t2.flatten())
-    Lprod = torch.ones([t2.ranks_tt[0], t1.ranks_tt[0]], device=t1.cores[0].device)
+    if t1.batch != t2.batch:
+        raise ValueError('Cannot mix batch and non-batch tensors')
+
+    terms1 = t1._summands()
+    terms2 = t2._summands()
+    if len(terms1) > 1 or len(terms2) > 1:  # Sums: the dot product is bilinear, so it is taken term by term
+        if t1 is t2 and (k is None or k == t1.dim()):  # Symmetric: each pair of terms is only contracted once
+            results = []
+            for i in range(len(terms1)):
+                results.append(dot(terms1[i], terms1[i]))
+                results.extend([2 * dot(terms1[i], terms1[j]) for j in range(i + 1, len(terms1))])
+        else:
+            results = [dot(a, b, k) for a in terms1 for b in terms2]
+        return tn.tensor._sum_terms(results)
+
+    if batch:
+        if k is not None or t1.dim() != t2.dim():
+            raise ValueError('Batch dot products only support contracting all dimensions')
+        if t1.shape[0] != t2.shape[0]:
+            raise ValueError('Batch sizes must be equal, but they are {} and {}'.format(t1.shape[0], t2.shape[0]))
+        Lprod = torch.ones([t1.shape[0], t2.ranks_tt[0], t1.ranks_tt[0]], device=t1.cores[0].device)
+        shape1 = t1.shape[1:]
+        shape2 = t2.shape[1:]
+    else:
+        Lprod = torch.ones([t2.ranks_tt[0], t1.ranks_tt[0]], device=t1.cores[0].device)
+        shape1 = t1.shape
+        shape2 = t2.shape
     if k is None:
         k = min(t1.dim(), t2.dim())
     assert k <= t1.dim() and k <= t2.dim()
-    if not np.array_equal(t1.shape[:k], t2.shape[:k]):
-        raise ValueError('Dot product requires leading dimensions to be equal, but they are {} and {}'.format(t1.shape[:k], t2.shape[:k]))
+    if not np.array_equal(shape1[:k], shape2[:k]):
+        raise ValueError('Dot product requires leading dimensions to be equal, but they are {} and {}'.format(shape1[:k], shape2[:k]))
+
+    t1._check_shared()
+    t2._check_shared()
 
     # Crunch first k dimensions of both tensors
     for mu in range(k):
-        core1 = t1.cores[mu]
-        core2 = t2.cores[mu]
-        # First part: absorb Tucker factors
-        if t1.Us[mu] is None:
-            if t2.Us[mu] is not None:
-                core1 = _project_spatial(core1, t2.Us[mu])
-        elif t2.Us[mu] is None:
-            core2 = _project_spatial(core2, t1.Us[mu])
-        else:  # Both have Tucker factors
-            core2 = _project_spatial(core2, torch.matmul(t2.Us[mu].t(), t1.Us[mu]))
-        # Second part: advance running factor `Lprod`
-        Ucore = _project_left(core1, Lprod)
-        Vcore = core2
-        if Vcore.dim() == 3:
-            Lprod = torch.matmul(tn.left_unfolding(Vcore).t(), tn.left_unfolding(Ucore))
-        else:
-            Lprod = torch.einsum('as,sar->sr', (Vcore, Ucore))
+        Lprod = _dot_step(Lprod, t1.cores[mu], t1.Us[mu], t2.cores[mu], t2.Us[mu], batch)
 
     # Deal with unprocessed dimensions, if any
     if k < t1.dim():
-        t1trail = tn.Tensor(t1.cores[k:], t1.Us[k:]).clone()
+        t1trail = tn.Tensor(t1.cores[k:], t1.Us[k:])
         t1trail.cores[0] = _project_left(t1trail.cores[0], Lprod)
         if k == t2.dim():
+            t1trail._share(t1)  # The trailing nodes are shared (copy-on-write)
             return t1trail
         else:
-            t2trail = tn.Tensor(t2.cores[k:], t2.Us[k:]).clone()
+            t2trail = tn.Tensor(t2.cores[k:], t2.Us[k:])
             t1trail = tn.transpose(t1trail)
-            return tn.Tensor(t1trail.cores + t2trail.cores, Us=t1trail.Us + t2trail.Us)
+            result = tn.Tensor(t1trail.cores + t2trail.cores, Us=t1trail.Us + t2trail.Us)
+            result._share(t1)
+            result._share(t2)
+            return result
     else:
         if k == t2.dim():
-            return torch.sum(Lprod)
+            return torch.sum(Lprod, dim=(-2, -1))
         else:
-            t2trail = tn.Tensor(t2.cores[k:], t2.Us[k:])#.clone()
+            t2trail = tn.Tensor(t2.cores[k:], t2.Us[k:])
             t2trail.cores[0] = _project_left(t2trail.cores[0], Lprod.t())
+            t2trail._share(t2)
             return t2trail
 
 
+def dots(t1, t2):
+    """
+    Computes the three dot products :math:`\\langle t_1, t_1 \\rangle`, :math:`\\langle t_2, t_2 \\rangle` and
+    :math:`\\langle t_1, t_2 \\rangle` in a single sweep over the cores (instead of three separate calls to
+    :func:`dot()`). This is what :func:`dist()` and :func:`relative_error()` need.
+
+    At each mode, the Tucker factors are absorbed with a single Gram product, and the first tensor's core is contracted
+    once against both running factors that involve it.
+
+    :param t1: a :class:`Tensor` (or a PyTorch tensor)
+    :param t2: a :class:`Tensor` (or a PyTorch tensor), with the same shape as `t1`
+
+    :return: three scalars (for batch tensors, three vectors with one value per batch element)
+    """
+
+    batch = _is_batch(t1, t2)
+    t1, t2 = _process(t1, t2)
+    if isinstance(t1, torch.Tensor) and isinstance(t2, torch.Tensor):
+        if batch:
+            t1 = t1.reshape(t1.shape[0], -1)
+            t2 = t2.reshape(t2.shape[0], -1)
+            return torch.sum(t1*t1, dim=1), torch.sum(t2*t2, dim=1), torch.sum(t1*t2, dim=1)
+        t1 = t1.flatten()
+        t2 = t2.flatten()
+        return t1.dot(t1), t2.dot(t2), t1.dot(t2)
+    if t1.batch != t2.batch:
+        raise ValueError('Cannot mix batch and non-batch tensors')
+    if not np.array_equal(t1.shape, t2.shape):
+        raise ValueError('Tensors must have the same shape, but they are {} and {}'.format(t1.shape, t2.shape))
+    if len(t1._summands()) > 1 or len(t2._summands()) > 1:  # Sums are contracted term by term (see dot())
+        return dot(t1, t1), dot(t2, t2), dot(t1, t2)
+
+    t1._check_shared()
+    t2._check_shared()
+    device = t1.cores[0].device
+    r1 = t1.ranks_tt[0]
+    r2 = t2.ranks_tt[0]
+    lead = [t1.shape[0]] if batch else []
+    L11 = torch.ones(lead + [r1, r1], device=device)
+    L22 = torch.ones(lead + [r2, r2], device=device)
+    L12 = torch.ones(lead + [r2, r1], device=device)
+    for mu in range(t1.dim()):
+        core1, U1 = t1.cores[mu], t1.Us[mu]
+        core2, U2 = t2.cores[mu], t2.Us[mu]
+
+        # Absorb Tucker factors: V11, V21 are in the spatial basis of `core1`, V22 in that of `core2`
+        V11, V21, V22 = core1, core2, core2
+        if U1 is not None and U2 is not None:  # The three Gram blocks come from one product
+            U = torch.cat((U1, U2), dim=-1)
+            G = torch.matmul(U.transpose(-1, -2), U)
+            s1 = U1.shape[-1]
+            V11 = _project_spatial(core1, G[..., :s1, :s1], batch)
+            V21 = _project_spatial(core2, G[..., s1:, :s1], batch)
+            V22 = _project_spatial(core2, G[..., s1:, s1:], batch)
+        elif U1 is not None:
+            V11 = _project_spatial(core1, torch.matmul(U1.transpose(-1, -2), U1), batch)
+            V21 = _project_spatial(core2, U1, batch)
+        elif U2 is not None:
+            V21 = _project_spatial(core2, U2.transpose(-1, -2), batch)
+            V22 = _project_spatial(core2, torch.matmul(U2.transpose(-1, -2), U2), batch)
+
+        # Advance the running factors: `core1` is projected once, on L11 and L12 stacked
+        r = L11.shape[-2]
+        Ucore = _project_left(core1, torch.cat((L11, L12), dim=-2), batch)
+        L11 = _dot_advance(Ucore[..., :r, :, :], V11, batch)
+        L12 = _dot_advance(Ucore[..., r:, :, :], V21, batch)
+        L22 = _dot_advance(_project_left(core2, L22, batch), V22, batch)
+    return torch.sum(L11, dim=(-2, -1)), torch.sum(L22, dim=(-2, -1)), torch.sum(L12, dim=(-2, -1))
+
+
+def gram(ts, chunk_size=None):
+    """
+    Computes the Gram matrix (all pairwise dot products) of a list of tensors in a single left-to-right sweep.
+
+    All tensors are cast to the TT format once, so Tucker factors are absorbed once per tensor instead of once per
+    pair. Their cores are then zero-padded to common ranks and stacked, and each step of the sweep advances all
+    :math:`K^2` running products at once with two batched contractions.
+
+    :param ts: a list of :math:`K` :class:`Tensor`, all with the same shape
+    :param chunk_size: if given, the rows of the Gram matrix are computed in chunks of this many tensors, which
+        bounds the memory used by the sweep (default is None: all rows at once)
+
+    :return: a :math:`K \\times K` PyTorch matrix
+    """
+
+    if any([t.batch for t in ts]):
+        raise ValueError('gram() does not support batch tensors')
+    shape = ts[0].shape
+    for t in ts:
+        if not np.array_equal(t.shape, shape):
+            raise ValueError('All tensors must have the same shape, but found {} and {}'.format(shape, t.shape))
+
+    ts = [t.tt() for t in ts]
+    K = len(ts)
+    device = ts[0].cores[0].device
+    stacked = []
+    for n in range(len(shape)):
+        r1 = max([t.cores[n].shape[0] for t in ts])
+        r2 = max([t.cores[n].shape[2] for t in ts])
+        c = torch.zeros(K, r1, shape[n], r2, dtype=ts[0].cores[n].dtype, device=device)
+        for k in range(K):
+            c[k, :ts[k].cores[n].shape[0], :, :ts[k].cores[n].shape[2]] = ts[k].cores[n]
+        stacked.append(c)
+
+    if chunk_size is None:
+        chunk_size = K
+    result = []
+    for start in range(0, K, chunk_size):
+        rows = slice(start, start + chunk_size)
+        Lprod = torch.ones(stacked[0][rows].shape[0], K, stacked[0].shape[1], stacked[0].shape[1], device=device)
+        for n in range(len(shape)):
+            Lprod = torch.einsum('klac,kaib->klcib', (Lprod, stacked[n][rows]))
+            Lprod = torch.einsum('klcib,lcid->klbd', (Lprod, stacked[n]))
+        result.append(torch.sum(Lprod, dim=(-2, -1)))
+    return torch.cat(result)
+
+
 def dist(t1, t2):
     """
     Computes the Euclidean distance between two tensors. Generally faster than `tn.norm(t1-t2)`.
@@ -114,13 +320,17 @@ def dist(t1, t2):
     :param t1: a :class:`Tensor` (or a PyTorch tensor)
     :param t2: a :class:`Tensor` (or a PyTorch tensor)
 
-    :return: a scalar :math:`\ge 0`
+    :return: a scalar :math:`\ge 0` (for batch tensors, a vector with one value per batch element)
     """
 
+    batch = _is_batch(t1, t2)
     t1, t2 = _process(t1, t2)
     if isinstance(t1, torch.Tensor) and isinstance(t2, torch.Tensor):
+        if batch:
+            return _batch_norm(t1-t2)
         return torch.dist(t1, t2)
-    return torch.sqrt(tn.dot(t1, t1) + tn.dot(t2, t2) - 2 * tn.dot(t1, t2).clamp(0))
+    dot11, dot22, dot12 = dots(t1, t2)
+    return torch.sqrt(dot11 + dot22 - 2 * dot12.clamp(0))
 
 
 def relative_error(gt, approx):
@@ -130,14 +340,17 @@ def relative_error(gt, approx):
     :param gt: a torch or tntorch tensor
     :param approx: a torch or tntorch tensor
 
-    :return: a scalar :math:`\ge 0`
+    :return: a scalar :math:`\ge 0` (for batch tensors, a vector with one value per batch element)
     """
 
+    batch = _is_batch(gt, approx)
     gt, approx = _process(gt, approx)
     if isinstance(gt, torch.Tensor) and isinstance(approx, torch.Tensor):
+        if batch:
+            return _batch_norm(gt-approx) / _batch_norm(gt)
         return torch.dist(gt, approx) / torch.norm(gt)
-    dotgt = tn.dot(gt, gt)
-    return torch.sqrt((dotgt + tn.dot(approx, approx) - 2*tn.dot(gt, approx)).clamp(0)) / torch.sqrt(dotgt.clamp(0))
+    dotgt, dotapprox, dotboth = dots(gt, approx)
+    return torch.sqrt((dotgt + dotapprox - 2*dotboth).clamp(0)) / torch.sqrt(dotgt.clamp(0))
 
 
 def rmse(gt, approx):
@@ -147,12 +360,17 @@ def rmse(gt, approx):
     :param gt: a torch or tntorch tensor
     :param approx: a torch or tntorch tensor
 
-    :return: a scalar :math:`\ge 0`
+    :return: a scalar :math:`\ge 0` (for batch tensors, a vector with one value per batch element)
     """
 
+    batch = _is_batch(gt, approx)
     gt, approx = _process(gt, approx)
     if isinstance(gt, torch.Tensor) and isinstance(approx, torch.Tensor):
+        if batch:  # Densified batch: one distance per item, over the non-batch dims
+            return _batch_norm(gt-approx) / np.sqrt(float(gt[0].numel()))
         return torch.dist(gt, approx) / np.sqrt(gt.numel())
+    if batch:
+        return tn.dist(gt, approx) / np.sqrt(float(gt.numel()) / gt.shape[0])
     return tn.dist(gt, approx) / torch.sqrt(gt.numel())
 
 
@@ -252,19 +470,20 @@ def std(t):
 
 def skew(t):
     """
-    Computes the skewness of a :class:`Tensor`. Note: this function uses cross-approximation (:func:`tntorch.cross()`).
+    Computes the skewness of a :class:`Tensor`. The third moment is computed exactly as :math:`\\langle z^2, z \\rangle`, where :math:`z` is the standardized tensor.
 
     :param t: a :class:`Tensor`
 
     :return: a scalar
     """
 
-    return tn.mean(((t-tn.mean(t))/tn.std(t))**3)
+    z = (t-tn.mean(t))/tn.std(t)
+    return tn.dot(z*z, z) / t.numel()
 
 
 def kurtosis(t, fisher=True):
     """
-    Computes the kurtosis of a :class:`Tensor`. Note: this function uses cross-approximation (:func:`tntorch.cross()`).
+    Computes the kurtosis of a :class:`Tensor`. The fourth moment is computed exactly as :math:`\\|z^2\\|^2`, where :math:`z` is the standardized tensor.
 
     :param t: a :class:`Tensor`
     :param fisher: if True (default) Fisher's definition is used, otherwise Pearson's (aka excess)
@@ -272,7 +491,8 @@ def kurtosis(t, fisher=True):
     :return: a scalar
     """
 
-    return tn.mean(((t-tn.mean(t))/tn.std(t))**4) - fisher*3
+    z = (t-tn.mean(t))/tn.std(t)
+    return tn.normsq(z*z) / t.numel() - fisher*3
 
 
 def raw_moment(t, k, eps=1e-6):
@@ -376,9 +596,16 @@ def normsq(t):
 
     :param t: a :class:`Tensor`
 
-    :return: a scalar :math:`\ge 0`
+    :return: a scalar :math:`\ge 0` (for batch tensors, a vector with one value per batch element)
     """
 
+    if isinstance(t, tn.Tensor):
+        center = t._orthogonality_center()
+        if center is not None:  # All the norm is in one core
+            core = t.cores[center]
+            if t.batch:
+                return torch.sum(core.reshape(core.shape[0], -1)**2, dim=1)
+            return torch.sum(core**2)
     return tn.dot(t, t)
 
 
@@ -388,7 +615,64 @@ def norm(t):
 
     :param t: a :class:`Tensor`
 
-    :return: a scalar :math:`\ge 0`
+    :return: a scalar :math:`\ge 0` (for batch tensors, a vector with one value per batch element)
     """
 
     return torch.sqrt(torch.clamp(tn.normsq(t), min=0))
+
+
+def topk(t, k, largest=True):
+    """
+    Finds the `k` largest (or smallest) entries of a tensor exactly, without decompressing it.
+
+    The tensor is cast to the TT format and right-orthogonalized, so that every TT suffix has norm at most 1. Then,
+    the norm of any partial contraction of the first cores bounds all entries that share that prefix. We run a
+    depth-first branch-and-bound over the prefixes, most promising children first, and discard those whose bound
+    cannot beat the `k`-th best entry found so far. Memory stays bounded: the search keeps at most
+    :math:`\\sum_n I_n` pending prefixes and `k` candidates.
+
+    :param t: a :class:`Tensor`
+    :param k: how many entries to find
+    :param largest: if True (default), the largest entries are returned; otherwise the smallest ones
+
+    :return: a PyTorch vector with (at most) `k` values, sorted from best to worst, and an integer matrix of size :math:`k \\times N` with their positions
+    """
+
+    if t.batch:
+        raise ValueError('topk() does not support batch tensors')
+
+    t = t.tt()
+    t.cores[0] = torch.sum(t.cores[0], dim=0, keepdim=True)  # Boundary ranks are summed over (as in `torch()`)
+    t.cores[-1] = torch.sum(t.cores[-1], dim=-1, keepdim=True)
+    if not largest:
+        t.cores[0] = -t.cores[0]
+    t.orthogonalize(0)
+    cores = [c.detach() for c in t.cores]
+    N = len(cores)
+
+    best = []  # Min-heap with the current `k` best (value, position) pairs
+    stack = [(float('inf'), torch.ones(cores[0].shape[0], device=cores[0].device), ())]
+    while len(stack) > 0:
+        bound, L, prefix = stack.pop()
+        if len(best) == k and bound <= best[0][0]:
+            continue
+        n = len(prefix)
+        children = torch.einsum('i,iaj->aj', (L, cores[n]))
+        if n == N-1:
+            for i, value in enumerate(torch.sum(children, dim=1).tolist()):
+                if len(best) < k:
+                    heapq.heappush(best, (value, prefix + (i,)))
+                elif value > best[0][0]:
+                    heapq.heapreplace(best, (value, prefix + (i,)))
+            continue
+        bounds = torch.norm(children, dim=1).tolist()
+        for i in np.argsort(bounds):  # Ascending: the most promising child will be popped first
+            if len(best) < k or bounds[i] > best[0][0]:
+                stack.append((bounds[i], children[i], prefix + (int(i),)))
+
+    best = sorted(best, reverse=True)
+    values = torch.tensor([value for value, position in best])
+    if not largest:
+        values = -values
+    Xs = torch.tensor([position for value, position in best], dtype=torch.long)
+    return values, Xs
@@ -1,3 +1,6 @@
+import functools
+import time
+import numpy as np
 import tntorch as tn
 import torch
 
@@ -17,7 +20,7 @@ def cumsum(t, dim=None):
     if not hasattr(dim, '__len__'):
         dim = [dim]
 
-    t = t.clone()
+    t = t._shallow_copy()
     for n in dim:
         if t.Us[n] is None:
             t.cores[n] = torch.cumsum(t.cores[n], dim=-2)
@@ -41,6 +44,226 @@ def cumprod(t, dim=None):
     return tn.exp(tn.cumsum(tn.log(t), dim=dim))
 
 
+"""
+Polynomial and Newton-Schulz operations (using rounding only, no cross-approximation)
+"""
+
+
+def polyval(t, coefficients, basis='monomial', eps=1e-14, rmax=None, algorithm=None):
+    """
+    Evaluates a polynomial element-wise on a tensor using only element-wise products, additions and TT rounding
+    (see :meth:`tensor.Tensor.round_tt()`) after each step. Unlike the cross-approximation based operations, the
+    result is deterministic and only affected by the rounding error.
+
+    :Example:
+
+    >>> tn.polyval(t, [1, 0, -2, 1])  # 1 - 2*t**2 + t**3
+
+    :param t: input :class:`Tensor`
+    :param coefficients: a list of :math:`D+1` scalars, in increasing degree order
+    :param basis: 'monomial' (default; evaluated with Horner's method) or 'chebyshev' (Chebyshev polynomials of the first kind; evaluated with Clenshaw's algorithm)
+    :param eps: relative error used at each rounding step (default is 1e-14)
+    :param rmax: rank limit used at each rounding step (default: no limit)
+    :param algorithm: passed to :meth:`tensor.Tensor.round_tt()`
+
+    :return: a :class:`Tensor`
+    """
+
+    assert basis in ('monomial', 'chebyshev')
+    coefficients = [float(c) for c in coefficients]
+    if len(coefficients) == 0:
+        raise ValueError('At least one coefficient is needed')
+
+    def round(x):
+        x.round_tt(eps=eps, rmax=rmax, algorithm=algorithm)
+        return x
+
+    if len(coefficients) == 1:
+        return tn.full_like(t, fill_value=coefficients[0])
+    if basis == 'monomial':  # Horner
+        result = round(t*coefficients[-1] + coefficients[-2])
+        for c in coefficients[-3::-1]:
+            result = round(result*t + c)
+        return result
+    # Clenshaw: b_k = c_k + 2*t*b_{k+1} - b_{k+2}, and the result is c_0 + t*b_1 - b_2
+    b1 = tn.full_like(t, fill_value=coefficients[-1])
+    b2 = None
+    for c in coefficients[-2:0:-1]:
+        b = 2*t*b1 + c
+        if b2 is not None:
+            b = b - b2
+        b1, b2 = round(b), b1
+    result = t*b1 + coefficients[0]
+    if b2 is not None:
+        result = result - b2
+    return round(result)
+
+
+def _integer_power(t, power, eps=1e-14, rmax=None, algorithm=None):
+    """
+    Computes `t**power` for an integer `power` >= 0 by repeated squaring, with rounding after each product.
+    """
+
+    assert power >= 0
+    if power == 0:
+        return tn.ones_like(t)
+    result = None
+    base = t
+    while True:
+        if power % 2 == 1:
+            if result is None:
+                result = base._shallow_copy()
+            else:
+                result = result*base
+                result.round_tt(eps=eps, rmax=rmax, algorithm=algorithm)
+        power //= 2
+        if power == 0:
+            return result
+        base = base*base
+        base.round_tt(eps=eps, rmax=rmax, algorithm=algorithm)
+
+
+def _is_integer_power(power):
+    return isinstance(power, (int, np.integer, float, np.floating)) and float(power).is_integer() and power >= 0
+
+
+def newton(t, function, eps=1e-6, rmax=None, max_iter=100, bounds=None, algorithm=None, verbose=False):
+    """
+    Computes an element-wise reciprocal, inverse square root or square root using Newton-Schulz iterations. These
+    only need element-wise products and TT rounding (see :meth:`tensor.Tensor.round_tt()`), so no
+    cross-approximation is involved:
+
+    - Reciprocal: :math:`y \\leftarrow y (2 - t y)`
+    - Inverse square root: :math:`y \\leftarrow y (3 - t y^2) / 2`
+    - Square root: :math:`t` times its inverse square root
+
+    The initial guess is a constant (or :math:`t / \\max |t|^2` for the reciprocal of tensors with mixed signs), chosen
+    from the range of `t` so that the iterations are guaranteed to converge.
+
+    :param t: input :class:`Tensor`
+    :param function: 'reciprocal', 'rsqrt' or 'sqrt'
+    :param eps: iterations stop once the residual (:math:`1 - t y` or :math:`1 - t y^2`) has RMS below `eps`. It is also the relative error used at each rounding step (default is 1e-6)
+    :param rmax: rank limit used at each rounding step (default: no limit)
+    :param max_iter: default is 100
+    :param bounds: a pair with the minimal and maximal values of `t`. If None (default), they will be computed exactly using :func:`metrics.topk()`
+    :param algorithm: passed to :meth:`tensor.Tensor.round_tt()`
+    :param verbose: Boolean
+
+    :return: a :class:`Tensor`
+    """
+
+    assert function in ('reciprocal', 'rsqrt', 'sqrt')
+
+    def round(x):
+        x.round_tt(eps=eps, rmax=rmax, algorithm=algorithm)
+        return x
+
+    if bounds is None:
+        bounds = (tn.topk(t, 1, largest=False)[0][0].item(), tn.topk(t, 1)[0][0].item())
+    lo, hi = bounds
+    if function == 'reciprocal':
+        if lo > 0 or hi < 0:  # Same sign everywhere: |1 - t*y| <= (hi-lo) / (hi+lo) < 1
+            y = tn.full_like(t, fill_value=2. / (lo+hi))
+        else:
+            y = t*(1. / max(np.abs(lo), np.abs(hi))**2)  # Not abs(): this module defines its own
+    else:
+        if lo <= 0:
+            raise ValueError('Newton iterations for {} require a positive tensor, but its minimum is {}'.format(function, lo))
+        y = tn.full_like(t, fill_value=np.sqrt(2. / (lo+hi)))  # 0 < t*y**2 < 2
+
+    start = time.time()
+    sqrt_numel = np.sqrt(float(t.numel()))
+    previous = float('inf')
+    for iter in range(max_iter):
+        if function == 'reciprocal':
+            ty = round(t*y)
+        else:
+            ty = round(t*round(y*y))
+        residual = (tn.norm(1-ty) / sqrt_numel).item()
+        if verbose:
+            print('iter: {: <{}} | eps: {:.8f} | largest rank: {:3d} | total time: {:9.4f}'.format(
+                iter, len('{}'.format(max_iter)), residual, max(y.ranks_tt), time.time() - start))
+        if residual < eps:
+            break
+        if residual >= previous:  # Stuck at the rounding error level: keep the previous iterate
+            y = y_previous
+            break
+        previous = residual
+        y_previous = y
+        if function == 'reciprocal':
+            y = round(y*(2-ty))
+        else:
+            y = round(y*(3-ty)*0.5)
+
+    if function == 'sqrt':
+        return round(t*y)
+    return y
+
+
+"""
+Composite element-wise functions (using a single cross-approximation)
+"""
+
+
+def apply(function, *tensors, **kwargs):
+    """
+    Evaluates an element-wise function of one or several tensors using a single cross-approximation.
+
+    Chaining the unary and binary operations below (e.g. `tn.exp(-tn.sqrt(x**2 + y**2)) * tn.sin(z)`) runs one
+    cross-approximation per operation, each one with its own sampling cost and approximation error. Instead, this
+    function approximates the whole expression at once.
+
+    :Example:
+
+    >>> x, y, z = tn.meshgrid([32]*3)
+    >>> tn.apply(lambda x, y, z: torch.exp(-torch.sqrt(x**2 + y**2)) * torch.sin(z), x, y, z)
+
+    :param function: a function that takes as many PyTorch vectors as `tensors` given and operates element-wise on them
+    :param tensors: one or several :class:`Tensor` of equal shape
+    :param kwargs: passed to :func:`cross.cross()`
+
+    :return: a :class:`Tensor`
+    """
+
+    if any([t.shape != tensors[0].shape for t in tensors[1:]]):
+        raise ValueError('All tensors must have the same shape, but got {}'.format(', '.join(str(list(t.shape)) for t in tensors)))
+    kwargs.setdefault('verbose', False)
+    return tn.cross(function=function, tensors=list(tensors), **kwargs)
+
+
+def elementwise(function=None, **kwargs):
+    """
+    Decorator that lets an element-wise function written for PyTorch tensors take :class:`Tensor` arguments. The
+    decorated function is then evaluated by :func:`apply()`, i.e. with a single cross-approximation. PyTorch tensors
+    may be mixed with :class:`Tensor` arguments: they are compressed first (see :class:`Tensor`).
+
+    :Example:
+
+    >>> @tn.elementwise(eps=1e-8)
+    ... def f(x, y):
+    ...     return torch.exp(-torch.sqrt(x**2 + y**2))
+    >>> f(x, y)  # `x` and `y` are :class:`Tensor`
+
+    :param function: the function to decorate
+    :param kwargs: passed to :func:`cross.cross()`
+
+    :return: the decorated function
+    """
+
+    if function is None:
+        return lambda f: elementwise(f, **kwargs)
+
+    @functools.wraps(function)
+    def wrapped(*tensors):
+        if not any([isinstance(t, tn.Tensor) for t in tensors]):  # Plain PyTorch call
+            return function(*tensors)
+        batch = any([isinstance(t, tn.Tensor) and t.batch for t in tensors])
+        tensors = [tn.Tensor(t, batch=batch) if isinstance(t, torch.Tensor) else t for t in tensors]
+        return apply(function, *tensors, **kwargs)
+
+    return wrapped
+
+
 """
 Unary operations (using cross-approximation)
 """
@@ -178,27 +401,39 @@ def log2(t):
     return tn.cross(lambda x: torch.log2(x), tensors=t, verbose=False)
 
 
-def reciprocal(t):
+def reciprocal(t, algorithm='cross', svd_algorithm=None, **kwargs):
     """
-    Element-wise reciprocal computed using cross-approximation; see PyTorch's `reciprocal()`.
+    Element-wise reciprocal computed using cross-approximation or Newton-Schulz iterations; see PyTorch's `reciprocal()`.
 
     :param t: input :class:`Tensor`
+    :param algorithm: 'cross' (default) or 'newton' (see :func:`newton()`)
+    :param svd_algorithm: SVD backend for all rounding steps if `algorithm` is 'newton' (passed to :func:`newton()`
+        as `algorithm`)
+    :param kwargs: passed to :func:`newton()`, if used
 
     :return: a :class:`Tensor`
     """
 
+    if algorithm == 'newton':
+        return tn.newton(t, 'reciprocal', algorithm=svd_algorithm, **kwargs)
     return tn.cross(lambda x: torch.reciprocal(x), tensors=t, verbose=False)
 
 
-def rsqrt(t):
+def rsqrt(t, algorithm='cross', svd_algorithm=None, **kwargs):
     """
-    Element-wise square-root reciprocal computed using cross-approximation; see PyTorch's `rsqrt()`.
+    Element-wise square-root reciprocal computed using cross-approximation or Newton-Schulz iterations; see PyTorch's `rsqrt()`.
 
     :param t: input :class:`Tensor`
+    :param algorithm: 'cross' (default) or 'newton' (see :func:`newton()`)
+    :param svd_algorithm: SVD backend for all rounding steps if `algorithm` is 'newton' (passed to :func:`newton()`
+        as `algorithm`)
+    :param kwargs: passed to :func:`newton()`, if used
 
     :return: a :class:`Tensor`
     """
 
+    if algorithm == 'newton':
+        return tn.newton(t, 'rsqrt', algorithm=svd_algorithm, **kwargs)
     return tn.cross(lambda x: torch.rsqrt(x), tensors=t, verbose=False)
 
 
@@ -238,15 +473,21 @@ def sinh(t):
     return tn.cross(lambda x: torch.sinh(x), tensors=t, verbose=False)
 
 
-def sqrt(t):
+def sqrt(t, algorithm='cross', svd_algorithm=None, **kwargs):
     """
-    Element-wise square root computed using cross-approximation; see PyTorch's `qrt()`.
+    Element-wise square root computed using cross-approximation or Newton-Schulz iterations; see PyTorch's `qrt()`.
 
     :param t: input :class:`Tensor`
+    :param algorithm: 'cross' (default) or 'newton' (see :func:`newton()`)
+    :param svd_algorithm: SVD backend for all rounding steps if `algorithm` is 'newton' (passed to :func:`newton()`
+        as `algorithm`)
+    :param kwargs: passed to :func:`newton()`, if used
 
     :return: a :class:`Tensor`
     """
 
+    if algorithm == 'newton':
+        return tn.newton(t, 'sqrt', algorithm=svd_algorithm, **kwargs)
     return tn.cross(lambda x: torch.sqrt(x), tensors=t, verbose=False)
 
 
@@ -305,16 +546,24 @@ def atan2(t1, t2):
     return tn.cross(lambda x, y: torch.atan2(x, y), tensors=[t1, t2], verbose=False)
 
 
-def div(t1, t2):
+def div(t1, t2, algorithm='cross', svd_algorithm=None, **kwargs):
     """
-    Element-wise division computed using cross-approximation; see PyTorch's `div()`.
+    Element-wise division computed using cross-approximation or Newton-Schulz iterations; see PyTorch's `div()`.
 
     :param t1: input :class:`Tensor`
     :param t2: input :class:`Tensor`
+    :param algorithm: 'cross' (default) or 'newton' (`t1` is multiplied by the reciprocal of `t2`, see :func:`newton()`)
+    :param svd_algorithm: SVD backend for all rounding steps if `algorithm` is 'newton' (passed to :func:`newton()`
+        as `algorithm`)
+    :param kwargs: passed to :func:`newton()`, if used
 
     :return: a :class:`Tensor`
     """
 
+    if algorithm == 'newton':
+        result = t1*tn.newton(t2, 'reciprocal', algorithm=svd_algorithm, **kwargs)
+        result.round_tt(eps=kwargs.get('eps', 1e-6), rmax=kwargs.get('rmax', None), algorithm=svd_algorithm)
+        return result
     return t1/t2
 
 
@@ -333,7 +582,8 @@ def mul(t1, t2):
 
 def pow(t1, t2):
     """
-    Element-wise power operation computed using cross-approximation; see PyTorch's `pow()`.
+    Element-wise power operation; see PyTorch's `pow()`. Non-negative integer powers are computed exactly by
+    repeated squaring and rounding, other powers use cross-approximation.
 
     :param t1: input :class:`Tensor`
     :param t2: input :class:`Tensor`
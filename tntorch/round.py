@@ -1,6 +1,7 @@
 import tntorch as tn
 import torch
 import numpy as np
+import threading
 import time
 
 
@@ -14,7 +15,7 @@ def round_tt(t, **kwargs):
     :return: a rounded copy of `t`
     """
 
-    t2 = t.clone()
+    t2 = t._shallow_copy()
     t2.round_tt(**kwargs)
     return t2
 
@@ -29,7 +30,7 @@ def round_tucker(t, **kwargs):
     :return: a rounded copy of `t`
     """
 
-    t2 = t.clone()
+    t2 = t._shallow_copy()
     t2.round_tucker(**kwargs)
     return t2
 
@@ -44,36 +45,400 @@ def round(t, **kwargs):
     :return: a rounded copy of `t`
     """
 
-    t2 = t.clone()
+    t2 = t._shallow_copy()
     t2.round(**kwargs)
     return t2
 
 
-def truncated_svd(M, delta=None, eps=None, rmax=None, left_ortho=True, algorithm='svd', verbose=False, batch=False):
+def to_cp(t, rank, max_iter=25, tol=1e-4, verbose=False):
+    """
+    Computes a CP decomposition of a compressed tensor with alternating least squares (ALS), without decompressing it.
+
+    The tensor is cast to the TT format, and every MTTKRP product is contracted directly against its cores: one sweep
+    costs :math:`O(NIRr^2)` for TT rank :math:`r` and CP rank :math:`R`. The approximation error is computed from the
+    Gram matrices of the factors. Factors are initialized to the leading left singular vectors of each unfolding
+    (HOSVD), which are read from the cores of the tensor as its orthogonality center moves from left to right.
+
+    :param t: a :class:`Tensor`
+    :param rank: the CP rank
+    :param max_iter: maximum number of ALS sweeps (default is 25)
+    :param tol: stopping criterion (change in relative error) (default is 1e-4)
+    :param verbose: Boolean
+
+    :return: a :class:`Tensor` in the CP format
+    """
+
+    if t.batch:
+        raise ValueError('to_cp() does not support batch tensors')
+
+    start = time.time()
+    t = t.tt()
+    N = t.dim()
+    device = t.cores[0].device
+
+    # Initialization: when the tensor is n-orthogonal, the n-th unfolding has the same left singular vectors as the
+    # n-th core
+    t.orthogonalize(0)
+    factors = []
+    for n in range(N):
+        core = t.cores[n]
+        U = torch.svd(core.permute(1, 0, 2).reshape(core.shape[1], -1))[0][:, :rank]
+        if U.shape[1] < rank:  # Complete with random entries
+            U = torch.cat((U, torch.randn(U.shape[0], rank - U.shape[1], device=device)), dim=1)
+        factors.append(U)
+        if n < N-1:
+            t.left_orthogonalize(n)
+    normsq = torch.sum(t.cores[-1]**2)
+    grams = [U.t().matmul(U) for U in factors]
+
+    def interface(n):  # For each rank-one term r, the n-th core contracted against the term's n-th vector
+        return torch.einsum('aib,ir->rab', (t.cores[n], factors[n]))
+
+    if verbose:
+        print('ALS -- initialization time =', time.time() - start)
+
+    errors = []
+    converged = False
+    for iter in range(max_iter):
+        rights = [None]*N + [torch.ones(rank, 1, device=device)]
+        for n in range(N-1, 0, -1):
+            rights[n] = torch.matmul(interface(n), rights[n+1][..., None])[..., 0]
+        left = torch.ones(rank, 1, device=device)
+        for n in range(N):
+            prod = torch.ones(rank, rank, device=device)
+            for m in range(N):
+                if m != n:
+                    prod *= grams[m]
+            mttkrp = torch.einsum('ra,aib,rb->ir', (left, t.cores[n], rights[n+1]))
+            factors[n] = tn.tensor.lstsq(mttkrp.t(), prod)
+            grams[n] = factors[n].t().matmul(factors[n])
+            if n < N-1:
+                left = torch.matmul(left[:, None, :], interface(n))[:, 0, :]
+
+        # ||X - Y||^2 = ||X||^2 - 2 <X, Y> + ||Y||^2, with <X, Y> taken from the last MTTKRP
+        inner = torch.sum(mttkrp * factors[-1])
+        errors.append(torch.sqrt(torch.clamp(normsq - 2 * inner + torch.sum(prod * grams[-1]), min=0) / normsq))
+        if len(errors) >= 2 and errors[-2] - errors[-1] < tol:
+            converged = True
+        if verbose:
+            print('iter: {: <{}} | eps: '.format(iter, len('{}'.format(max_iter))), end='')
+            print('{:.8f}'.format(errors[-1]), end='')
+            print(' | total time: {:9.4f}'.format(time.time() - start), end='')
+            if converged:
+                print(' <- converged (tol={})'.format(tol))
+            elif iter == max_iter-1:
+                print(' <- max_iter was reached: {}'.format(max_iter))
+            else:
+                print()
+        if converged:
+            break
+
+    return tn.Tensor(factors)
+
+
+class auto_round(object):
+    """
+    Context manager that makes arithmetic operators between tensors (`+`, `-`, `*`, and the logic operators built on
+    them) return rounded results, so that chained expressions do not accumulate TT ranks.
+
+    :Example:
+
+    >>> with tn.auto_round(eps=1e-8, rmax=200):
+    ...     t = t1*t2 + t3*t4 - t5  # Every intermediate result is rounded
+
+    When `rmax` is given, sums and products of (non-batch) tensors are rounded with a randomized sketch that contracts
+    the operands directly, so the (large) cores of the exact sum or product are never built. Tucker factors and CP
+    cores are absorbed into TT cores first, so the result is a pure TT tensor. The sketched result, of rank at most
+    `rmax` + `oversampling`, is then rounded deterministically. Otherwise (without `rmax`, for batch tensors, or if the
+    exact result would not exceed the sketch rank), the exact result is computed and rounded with
+    :meth:`tensor.Tensor.round_tt()`.
+
+    Reference: H. Al Daas et al., `"Randomized Algorithms for Rounding in the Tensor-Train Format" (2023) <https://epubs.siam.org/doi/10.1137/21M1451191>`_
+
+    :param eps: relative error used at each rounding step (default is 1e-14)
+    :param rmax: rank limit used at each rounding step (default: no limit)
+    :param oversampling: extra sketch ranks used on top of `rmax` (default is 10)
+    :param algorithm: passed to :meth:`tensor.Tensor.round_tt()`
+    """
+
+    _local = threading.local()  # Policies are only active in the thread that entered them
+
+    def __init__(self, eps=1e-14, rmax=None, oversampling=10, algorithm=None):
+        self.eps = eps
+        self.rmax = rmax
+        self.oversampling = oversampling
+        self.algorithm = algorithm
+
+    @staticmethod
+    def _stack():
+        if not hasattr(auto_round._local, 'stack'):
+            auto_round._local.stack = []
+        return auto_round._local.stack
+
+    def __enter__(self):
+        auto_round._stack().append(self)
+        return self
+
+    def __exit__(self, *args):
+        auto_round._stack().pop()
+
+    @staticmethod
+    def active():
+        """
+        Returns the innermost policy active in the current thread, or None if there is none.
+        """
+
+        stack = auto_round._stack()
+        if len(stack) == 0:
+            return None
+        return stack[-1]
+
+    def add(self, t1, t2):
+        """
+        Computes `t1 + t2` and rounds the result.
+        """
+
+        return self._apply(t1, t2, '+')
+
+    def mul(self, t1, t2):
+        """
+        Computes `t1 * t2` and rounds the result.
+        """
+
+        if not isinstance(t2, tn.Tensor):  # Scaling does not change the ranks
+            return t1._mul(t2)
+        return self._apply(t1, t2, '*')
+
+    def _apply(self, t1, t2, operation):
+        if self.rmax is not None and isinstance(t2, tn.Tensor) and t1.shape == t2.shape and t1.dim() > 1 and \
+                not t1.batch and not t2.batch:
+            rmax = int(np.max(self.rmax))
+            rank = rmax + self.oversampling
+            cores1 = _tt_cores(t1)
+            cores2 = _tt_cores(t2)
+            if operation == '+':
+                ranks = [c1.shape[-1] + c2.shape[-1] for c1, c2 in zip(cores1[:-1], cores2[:-1])]
+            else:
+                ranks = [c1.shape[-1] * c2.shape[-1] for c1, c2 in zip(cores1[:-1], cores2[:-1])]
+            if max(ranks) > rank:  # Otherwise, there is nothing to gain
+                result = tn.Tensor(_sketch_round(cores1, cores2, operation, rank))
+                result.round_tt(eps=self.eps, rmax=self.rmax, algorithm=self.algorithm)
+                return result
+        if operation == '+':
+            result = t1._add(t2)
+        else:
+            result = t1._mul(t2)
+        result.round_tt(eps=self.eps, rmax=self.rmax, algorithm=self.algorithm)
+        return result
+
+
+def _tt_cores(t):
+    """
+    Returns the cores of a tensor cast as a pure TT (the tensor itself is not modified).
+    """
+
+    t = t.decompress_tucker_factors(_clone=False)
+    t._cp_to_tt()
+    return t.cores
+
+
+def _sketch_round(cores1, cores2, operation, rank):
+    """
+    Approximates the sum or element-wise product of two TT tensors by another TT tensor of rank at most `rank`
+    ("randomize-then-orthogonalize"). The cores of the exact result (block-diagonal for the sum, Kronecker products for
+    the element-wise product) are never formed: all contractions are done against the operands' cores.
+
+    :param cores1: TT cores of the first operand
+    :param cores2: TT cores of the second operand
+    :param operation: '+' or '*'
+    :param rank: sketch size
+
+    :return: a list of TT cores
+    """
+
+    N = len(cores1)
+    device = cores1[0].device
+    omegas = [torch.randn(1 if n == 0 else rank, cores1[n].shape[1], 1 if n == N-1 else rank, device=device) for n in range(N)]
+
+    # Right-to-left: contract both operands against the random TT
+    if operation == '+':
+        Ws = [None]*N + [(torch.ones(cores1[-1].shape[-1], 1, device=device), torch.ones(cores2[-1].shape[-1], 1, device=device))]
+        for n in range(N-1, 0, -1):
+            W1, W2 = Ws[n+1]
+            Ws[n] = (torch.einsum('aiy,liy->al', (torch.einsum('aix,xy->aiy', (cores1[n], W1)), omegas[n])),
+                     torch.einsum('aiy,liy->al', (torch.einsum('aix,xy->aiy', (cores2[n], W2)), omegas[n])))
+    else:
+        Ws = [None]*N + [torch.ones(cores1[-1].shape[-1], cores2[-1].shape[-1], 1, device=device)]
+        for n in range(N-1, 0, -1):
+            W = torch.einsum('aix,xyz->aiyz', (cores1[n], Ws[n+1]))
+            W = torch.einsum('aiyz,biy->abiz', (W, cores2[n]))
+            Ws[n] = torch.einsum('abiz,liz->abl', (W, omegas[n]))
+
+    # Left-to-right: orthogonalize the sketched cores
+    if operation == '+':
+        L1 = torch.ones(1, cores1[0].shape[0], device=device)
+        L2 = torch.ones(1, cores2[0].shape[0], device=device)
+    else:
+        L = torch.ones(1, cores1[0].shape[0], cores2[0].shape[0], device=device)
+    cores = []
+    for n in range(N):
+        if operation == '+':
+            M1 = torch.einsum('xa,aiy->xiy', (L1, cores1[n]))
+            M2 = torch.einsum('xa,aiy->xiy', (L2, cores2[n]))
+            if n == N-1:
+                cores.append(torch.sum(M1, dim=-1, keepdim=True) + torch.sum(M2, dim=-1, keepdim=True))
+                break
+            W1, W2 = Ws[n+1]
+            Z = torch.einsum('xiy,yl->xil', (M1, W1)) + torch.einsum('xiy,yl->xil', (M2, W2))
+        else:
+            M = torch.einsum('xab,aiy->xbiy', (L, cores1[n]))
+            M = torch.einsum('xbiy,biz->xiyz', (M, cores2[n]))
+            if n == N-1:
+                cores.append(torch.sum(M, dim=(2, 3))[..., None])
+                break
+            Z = torch.einsum('xiyz,yzl->xil', (M, Ws[n+1]))
+        Q, _ = torch.qr(tn.left_unfolding(Z))
+        core = torch.reshape(Q, Z.shape[:-1] + (Q.shape[-1], ))
+        cores.append(core)
+        if operation == '+':
+            L1 = torch.einsum('xiq,xiy->qy', (core, M1))
+            L2 = torch.einsum('xiq,xiy->qy', (core, M2))
+        else:
+            L = torch.einsum('xiq,xiyz->qyz', (core, M))
+    return cores
+
+
+_svd_algorithms = ('svd', 'eig', 'randomized', 'auto')
+_svd_algorithm = 'svd'
+
+
+def set_svd_algorithm(algorithm):
+    """
+    Sets the SVD backend used by :func:`truncated_svd()` (and hence by all rounding and decomposition methods) when
+    none is given explicitly.
+
+    :param algorithm: 'svd' (initial default), 'eig', 'randomized' or 'auto' (see :func:`truncated_svd()`). Since
+        'randomized' needs a maximal rank, truncations without one fall back to the backend 'auto' would choose
+    """
+
+    global _svd_algorithm
+    if algorithm not in _svd_algorithms:
+        raise ValueError("Unknown SVD algorithm '{}': use one of {}".format(algorithm, _svd_algorithms))
+    _svd_algorithm = algorithm
+
+
+def get_svd_algorithm():
+    """
+    Returns the default SVD backend (see :func:`set_svd_algorithm()`).
+    """
+
+    return _svd_algorithm
+
+
+def _choose_svd_algorithm(shape, rmax):
+    """
+    Picks an SVD backend for a matrix of a given shape: a randomized range finder if the requested rank is small
+    compared to both dimensions, the Gram matrix if the matrix is tall and skinny (or short and wide), and a full SVD
+    otherwise.
+    """
+
+    small, large = min(shape[-2:]), max(shape[-2:])
+    if rmax is not None and 4*(rmax + 10) <= small:
+        return 'randomized'
+    if 4*small <= large:
+        return 'eig'
+    return 'svd'
+
+
+def _eigh(M):
+    """
+    Eigendecomposition of a symmetric matrix (or batch), with eigenvalues in (approximately) decreasing order.
+    """
+
+    if hasattr(torch, 'linalg') and hasattr(torch.linalg, 'eigh'):
+        w, v = torch.linalg.eigh(M)
+    else:
+        w, v = torch.symeig(M, eigenvectors=True)
+    # Eigenvalues come in ascending order
+    return torch.flip(w, [-1]), torch.flip(v, [-1])
+
+
+def _randomized_svd(M, rank, n_iter=2):
+    """
+    Approximates the leading `rank` singular triplets of a matrix (or batch) using a randomized range finder with
+    power iterations.
+
+    Reference: N. Halko et al., `"Finding Structure with Randomness: Probabilistic Algorithms for Constructing Approximate Matrix Decompositions" (2011) <https://epubs.siam.org/doi/10.1137/090771806>`_
+
+    :param M: a matrix (or batch of matrices)
+    :param rank: number of singular triplets (including oversampling)
+    :param n_iter: number of power iterations (default is 2)
+
+    :return: U, S
+    """
+
+    Omega = torch.randn(M.shape[:-2] + (M.shape[-1], rank), dtype=M.dtype, device=M.device)
+    Q, _ = torch.qr(torch.matmul(M, Omega))
+    for i in range(n_iter):
+        Q, _ = torch.qr(torch.matmul(M.transpose(-1, -2), Q))
+        Q, _ = torch.qr(torch.matmul(M, Q))
+    U, S, _ = torch.svd(torch.matmul(Q.transpose(-1, -2), M))
+    return torch.matmul(Q, U), S
+
+
+def truncated_svd(M, delta=None, eps=None, rmax=None, left_ortho=True, algorithm=None, verbose=False, batch=False,
+                  _discarded=False):
     """
     Decomposes a matrix M (size (m x n) in two factors U and V (sizes m x r and r x n) with bounded error (or given r).
 
-    :param M: a matrix
-    :param delta: if provided, maximum error norm
+    In batch mode, every matrix gets its own rank (as set by `delta` or `eps`). The factors are padded to the
+    largest of those ranks: for each matrix, the columns of U (and rows of V) beyond its own rank are zero.
+
+    Available backends:
+
+    - 'svd': full SVD of M
+    - 'eig': eigendecomposition of the Gram matrix (M M^T or M^T M, whichever is smaller). Much faster for tall and skinny matrices, but less accurate: singular values below roughly 1e-8 times the largest one are lost
+    - 'randomized': randomized range finder for the leading `rmax` singular vectors (plus oversampling). Requires `rmax` (if it is only the default set with :func:`set_svd_algorithm()`, the choice of 'auto' is used instead when `rmax` is missing), and the error bound only accounts for the singular values it finds
+    - 'auto': one of the above, depending on the shape of M and on `rmax`
+
+    :param M: a matrix (or batch of matrices)
+    :param delta: if provided, maximum error norm (in batch mode, either a scalar or one value per matrix)
     :param eps: if provided, maximum relative error
     :param rmax: optionally, maximum r
     :param left_ortho: if True (default), U will be orthonormal. If False, V will
-    :param algorithm: 'svd' (default) or 'eig'. The latter is often faster, but less accurate
+    :param algorithm: 'svd', 'eig', 'randomized' or 'auto'. If None (default), the one set with :func:`set_svd_algorithm()`
     :param verbose: Boolean
     :param batch: Boolean
 
-    :return: U, V
+    :return: U, V (and, if `_discarded` is True, the sum of the discarded squared singular values: the squared error
+        of the truncation, one value per matrix in batch mode)
     """
     if delta is not None and eps is not None:
         raise ValueError('Provide either `delta` or `eps`')
     if delta is None and eps is not None:
-        delta = eps*torch.norm(M).item()
+        if batch:
+            delta = eps*torch.sqrt(torch.sum(M.reshape(M.shape[0], -1)**2, dim=1))
+        else:
+            delta = eps*torch.norm(M).item()
     if delta is None and eps is None:
         delta = 0
     if rmax is None:
         rmax = np.iinfo(np.int32).max
     assert rmax >= 1
-    assert algorithm in ('svd', 'eig')
+    default = algorithm is None
+    if default:
+        algorithm = _svd_algorithm
+    if algorithm not in _svd_algorithms:
+        raise ValueError("Unknown SVD algorithm '{}': use one of {}".format(algorithm, _svd_algorithms))
+    if algorithm == 'randomized' and default and rmax == np.iinfo(np.int32).max:
+        algorithm = 'auto'
+    if algorithm == 'auto':
+        algorithm = _choose_svd_algorithm(M.shape, None if rmax == np.iinfo(np.int32).max else rmax)
+    if algorithm == 'randomized':
+        if rmax == np.iinfo(np.int32).max:
+            raise ValueError("The 'randomized' SVD algorithm requires `rmax`")
+        if rmax + 10 >= min(M.shape[-2:]):  # Nothing to gain
+            algorithm = 'svd'
 
     if batch:
         batch_size = M.shape[0]
@@ -86,6 +451,12 @@ def truncated_svd(M, delta=None, eps=None, rmax=None, left_ortho=True, algorithm
         singular_vectors = 'left'
         if verbose:
             print('Time (SVD):', time.time() - start)
+    elif algorithm == 'randomized':
+        start = time.time()
+        svd = list(_randomized_svd(M, rmax + 10))
+        singular_vectors = 'left'
+        if verbose:
+            print('Time (randomized SVD):', time.time() - start)
     else:
         start = time.time()
         if M.shape[-2] <= M.shape[-1]:
@@ -104,81 +475,85 @@ def truncated_svd(M, delta=None, eps=None, rmax=None, left_ortho=True, algorithm
         if verbose:
             print('Time (gram):', time.time() - start)
         start = time.time()
-        w, v = torch.symeig(gram, eigenvectors=True)
+        w, v = _eigh(gram)
         if verbose:
             print('Time (symmetric EIG):', time.time() - start)
-        w = torch.where(w < 0, torch.zeros_like(w) + 1e-8, w)
-        w = torch.sqrt(w)
-        svd = [v, w]
-        # Sort eigenvalues and eigenvectors in decreasing importance
-        if batch:
-            reverse = np.arange(len(svd[1][0])-1, -1, -1)
-            idx = torch.argsort(svd[1])[:, reverse]
-            svd[0] = torch.cat([svd[0][i, ..., idx[i]][None, ...] for i in range(len(idx))])
-            svd[1] = torch.cat([svd[1][i, ..., idx[i]][None, ...] for i in range(len(idx))])
-        else:
-            reverse = np.arange(len(svd[1])-1, -1, -1)
-            idx = torch.argsort(svd[1])[reverse]
-            svd[0] = svd[0][..., idx]
-            svd[1] = svd[1][..., idx]
+        # Round-off can make some eigenvalues negative: they carry no energy. Sort in decreasing importance after
+        # clamping
+        w = torch.clamp(w, min=0)
+        idx = torch.argsort(w, dim=-1, descending=True)
+        w = torch.gather(w, -1, idx)
+        v = torch.gather(v, -1, idx[..., None, :].expand_as(v))
+        svd = [v, torch.sqrt(w)]
 
     if batch:
-        if (svd[1][0] - torch.zeros_like(svd[1][0])).mean() < 1e-13:
-            return torch.zeros([batch_size, M.shape[1], 1]), torch.zeros([batch_size, 1, M.shape[2]])
-    else:
-        if svd[1][0] < 1e-13: # Special case: M = zero -> rank is 1
-            return torch.zeros([M.shape[0], 1]), torch.zeros([1, M.shape[1]])
+        S = svd[1]**2
+        # Per-matrix ranks: the smallest rank whose discarded energy is below that matrix's delta
+        delta = torch.as_tensor(delta, dtype=S.dtype, device=device).reshape(-1)
+        tail = torch.flip(torch.cumsum(torch.flip(S, [1]), dim=1), [1])  # Error when keeping k singular values
+        ranks = torch.clamp(torch.sum(tail > delta[:, None]**2, dim=1), 1, min(rmax, S.shape[1]))
+        rank = int(torch.max(ranks).item())
+        mask = (torch.arange(rank, device=device)[None, :] < ranks[:, None]).to(S.dtype)
+        sv = svd[1][:, :rank]
+        inv = torch.where(sv > 0, 1. / torch.where(sv > 0, sv, torch.ones_like(sv)), torch.zeros_like(sv)) * mask
+        left = svd[0][..., :rank] * mask[:, None, :]
+
+        start = time.time()
+        if singular_vectors == 'left':
+            if left_ortho:
+                M2 = torch.matmul(left.permute(0, 2, 1), M)
+            else:
+                M2 = torch.matmul(inv[:, :, None] * left.permute(0, 2, 1), M)
+                left = left * sv[:, None, :]
+        else:
+            if left_ortho:
+                M2 = torch.matmul(M, left * inv[:, None, :])
+                left, M2 = M2, (left * sv[:, None, :]).permute(0, 2, 1)
+            else:
+                M2 = torch.matmul(M, left)
+                left, M2 = M2, left.permute(0, 2, 1)
+        if verbose:
+            print('Time (product):', time.time() - start)
+        if _discarded:
+            tail = torch.cat((tail, torch.zeros_like(tail[:, :1])), dim=1)
+            return left, M2, torch.gather(tail, 1, ranks[:, None])[:, 0].detach()
+        return left, M2
+
+    if svd[1][0] < 1e-13: # Special case: M = zero -> rank is 1
+        if _discarded:
+            return torch.zeros([M.shape[0], 1]), torch.zeros([1, M.shape[1]]), torch.sum(svd[1]**2).item()
+        return torch.zeros([M.shape[0], 1]), torch.zeros([1, M.shape[1]])
 
     S = svd[1]**2
 
-    if batch:
-        rank = max(1, int(min(rmax, len(S[0]))))
-    else:
-        reverse = np.arange(len(S)-1, -1, -1)
-        where = np.where((torch.cumsum(S[reverse], dim=0).detach().cpu() <= delta**2))[0]
+    reverse = np.arange(len(S)-1, -1, -1)
+    where = np.where((torch.cumsum(S[reverse], dim=0).detach().cpu() <= delta**2))[0]
 
-        if len(where) == 0:
-            rank = max(1, int(min(rmax, len(S))))
-        else:
-            rank = max(1, int(min(rmax, len(S) - 1 - where[-1])))
+    if len(where) == 0:
+        rank = max(1, int(min(rmax, len(S))))
+    else:
+        rank = max(1, int(min(rmax, len(S) - 1 - where[-1])))
 
     left = svd[0]
-    if batch:
-        factor = torch.max(torch.abs(svd[1])) * 1e-14 * torch.randn(*svd[1].shape).to(device)
-        mid = torch.where(svd[1] == 0, factor * torch.ones_like(svd[1]).to(device), svd[1])
-        svd = (left, mid)
     left = left[..., :rank]
 
     start = time.time()
     if singular_vectors == 'left':
         if left_ortho:
-            if batch:
-                M2 = torch.matmul(left.permute(0, 2, 1), M)
-            else:
-                M2 = torch.mm(left.permute(1, 0), M)
+            M2 = torch.mm(left.permute(1, 0), M)
         else:
-            if batch:
-                M2 = torch.matmul((1. / svd[1][:, :rank])[:, :, None] * left.permute(0, 2, 1), M)
-                left = torch.einsum('bij,bj->bij', left, svd[1][:, :rank])
-            else:
-                M2 = torch.mm((1. / svd[1][:rank])[:, None]*left.permute(1, 0), M)
-                left = left * svd[1][:rank]
+            M2 = torch.mm((1. / svd[1][:rank])[:, None]*left.permute(1, 0), M)
+            left = left * svd[1][:rank]
     else:
         if left_ortho:
-            if batch:
-                M2 = torch.matmul(M, (left * (1. / svd[1][:, :rank])[:, None, :]))
-                left, M2 = M2, torch.matmul(left, (torch.diag(svd[1][:, :rank]))).permute(0, 2, 1)
-            else:
-                M2 = torch.mm(M, (left * (1. / svd[1][:rank])[None, :]))
-                left, M2 = M2, torch.mm(left, (torch.diag(svd[1][:rank]))).permute(1, 0)
+            M2 = torch.mm(M, (left * (1. / svd[1][:rank])[None, :]))
+            left, M2 = M2, torch.mm(left, (torch.diag(svd[1][:rank]))).permute(1, 0)
         else:
-            if batch:
-                M2 = torch.matmul(M, left)
-                left, M2 = M2, left.permute(0, 2, 1)
-            else:
-                M2 = torch.mm(M, left)
-                left, M2 = M2, left.permute(1, 0)
+            M2 = torch.mm(M, left)
+            left, M2 = M2, left.permute(1, 0)
     if verbose:
         print('Time (product):', time.time() - start)
 
+    if _discarded:
+        return left, M2, torch.sum(S[rank:]).item()
     return left, M2
@@ -2,21 +2,27 @@ import numpy as np
 import torch
 import tntorch as tn
 import time
+import weakref
 
 # Note: untill pytorch supports differentiable lstsq
 def lstsq(b, A):
-    if A.dim() == 3:
-        batch = True
-    elif A.dim() == 2:
-        batch = False
-    else:
+    if A.dim() not in (2, 3):
         raise RuntimeError('Wrong shape of A')
 
-    q, r = torch.qr(A)
-    if batch:
-        return torch.cat([torch.matmul(torch.matmul(r[i].inverse(), q[i].t()), b[i])[None, ...] for i in range(len(q))]).transpose(-1, -2)
-    else:
-        return torch.matmul(torch.matmul(r.inverse(), q.t()), b).transpose(-1, -2)
+    q, r = torch.qr(A)  # Batched if A is a batch of matrices
+    return torch.matmul(torch.matmul(torch.inverse(r), q.transpose(-1, -2)), b).transpose(-1, -2)
+
+
+def _lstsq_exact(b, A):
+    """
+    Same as :func:`lstsq()`, but using PyTorch's least squares solver (batched if A is a batch of matrices).
+    """
+
+    if hasattr(torch, 'linalg') and hasattr(torch.linalg, 'lstsq'):
+        return torch.linalg.lstsq(A, b).solution.transpose(-1, -2)
+    if A.dim() == 3:  # Older PyTorch versions only solve one system at a time
+        return torch.cat([torch.lstsq(b[i], A[i])[0][None, :A.shape[-1]] for i in range(len(A))]).transpose(-1, -2)
+    return torch.lstsq(b, A)[0][:A.shape[-1]].transpose(-1, -2)
 
 
 def _full_rank_tt(data, batch=False): # Naive TT formatting, don't even attempt to compress
@@ -40,12 +46,12 @@ def _full_rank_tt(data, batch=False): # Naive TT formatting, don't even attempt
     for n in range(1, N):
         if batch:
             if resh.shape[1] < resh.shape[2]:
-                I = torch.cat([torch.eye(resh.shape[1])[None, ...] for _ in range(resh.shape[0])]).to(device)
+                I = torch.eye(resh.shape[1], device=device)[None, ...].repeat(resh.shape[0], 1, 1)
                 result.append(torch.reshape(I, [resh.shape[0], resh.shape[1] // shape[n], shape[n], resh.shape[1]]))
                 resh = torch.reshape(resh, (resh.shape[0], resh.shape[1] * shape[n + 1], resh.shape[2] // shape[n + 1]))
             else:
                 result.append(torch.reshape(resh, [resh.shape[0], resh.shape[1] // shape[n], shape[n], resh.shape[2]]))
-                I = torch.cat([torch.eye(resh.shape[2])[None, ...] for _ in range(resh.shape[0])]).to(device)
+                I = torch.eye(resh.shape[2], device=device)[None, ...].repeat(resh.shape[0], 1, 1)
                 resh = torch.reshape(I, (resh.shape[0], resh.shape[2] * shape[n + 1], resh.shape[2] // shape[n + 1]))
         else:
             if resh.shape[0] < resh.shape[1]:
@@ -64,6 +70,85 @@ def _full_rank_tt(data, batch=False): # Naive TT formatting, don't even attempt
     return result
 
 
+def _randomized_range(U, C, rank, n_iter=2):
+    """
+    Randomized range finder (with power iterations) for the matrix :math:`A = UC^T` (or :math:`A = C^T` if `U` is
+    None), which is never formed: only products of `U` and `C` with thin matrices are computed.
+
+    Reference: N. Halko et al., `"Finding Structure with Randomness: Probabilistic Algorithms for Constructing Approximate Matrix Decompositions" (2011) <https://epubs.siam.org/doi/10.1137/090771806>`_
+
+    :param U: a matrix of size :math:`I \\times S` (or batch of matrices), or None
+    :param C: a matrix of size :math:`M \\times S` (or batch of matrices)
+    :param rank: sketch size
+    :param n_iter: number of power iterations (default is 2)
+
+    :return: Q (orthonormal basis for the range of A, size :math:`I \\times` `rank`) and :math:`A^T Q`
+    """
+
+    def apply(X):  # A X
+        X = torch.matmul(C.transpose(-1, -2), X)
+        return X if U is None else torch.matmul(U, X)
+
+    def apply_t(X):  # A^T X
+        if U is not None:
+            X = torch.matmul(U.transpose(-1, -2), X)
+        return torch.matmul(C, X)
+
+    Omega = torch.randn(C.shape[:-1] + (rank,), dtype=C.dtype, device=C.device)
+    Q, _ = torch.qr(apply(Omega))
+    for i in range(n_iter):
+        Z, _ = torch.qr(apply_t(Q))
+        Q, _ = torch.qr(apply(Z))
+    return Q, apply_t(Q)
+
+
+def _mttkrp(data, factors, n, batch=False):
+    """
+    Matricized tensor times Khatri-Rao product (MTTKRP): contracts a full tensor against all CP factors except the
+    `n`-th one. The Khatri-Rao product is never formed: the largest mode is contracted first with a matrix product,
+    and the remaining ones are absorbed one at a time, so the memory never exceeds
+    :math:`O(\\frac{I_1 \\cdots I_N}{\\max_{m \\neq n} I_m} R)`.
+
+    :param data: a PyTorch tensor (with a leading batch mode if `batch` is True)
+    :param factors: a list of CP factors, each of shape :math:`I_m \\times R` (or batch of factors)
+    :param n: the mode that is left uncontracted
+    :param batch: Boolean
+
+    :return: a matrix of shape :math:`I_n \\times R` (or batch of matrices)
+    """
+
+    b = int(batch)
+    N = data.dim() - b
+    R = factors[n].shape[-1]
+    others = sorted([m for m in range(N) if m != n], key=lambda m: -data.shape[b + m])
+    if len(others) == 0:
+        return data[..., None].expand(*(tuple(data.shape) + (R,)))
+
+    # Contract the largest mode with a matrix product; it leaves a trailing rank mode
+    m = others[0]
+    modes = list(range(N))
+    modes[m], modes[-1] = modes[-1], modes[m]
+    modes = modes[:-1]
+    x = data.transpose(b + m, -1)
+    shape = tuple(x.shape[:-1]) + (R,)
+    if batch:
+        x = torch.matmul(x.reshape(x.shape[0], -1, x.shape[-1]), factors[m])
+    else:
+        x = torch.matmul(x.reshape(-1, x.shape[-1]), factors[m])
+    x = x.reshape(shape)
+
+    # Absorb the other modes: each one is diagonal along the rank mode
+    for m in others[1:]:
+        axis = modes.index(m)
+        view = [1] * (x.dim() - 1) + [R]
+        if batch:
+            view[0] = x.shape[0]
+        view[b + axis] = x.shape[b + axis]
+        x = torch.sum(x * factors[m].reshape(view), dim=b + axis)
+        modes.pop(axis)
+    return x
+
+
 class Tensor(object):
 
     """
@@ -80,7 +165,7 @@ class Tensor(object):
     def __init__(self, data, Us=None, idxs=None, device=None, requires_grad=None,
                  ranks_cp=None, ranks_tucker=None, ranks_tt=None, eps=None,
                  max_iter=25, tol=1e-4, verbose=False, batch=False,
-                 algorithm='svd', lstsq_algorithm='qr'):
+                 algorithm=None, lstsq_algorithm='qr'):
 
         """
         The constructor can either:
@@ -104,14 +189,16 @@ class Tensor(object):
         :param tol: stopping criterion (change in relative error) when computing a CP decomposition using ALS
         :param verbose: Boolean
         :param batch: Boolean
-        :param algorithm: 'svd' (default) or 'eig'. The latter can be faster, but less accurate
+        :param algorithm: SVD backend: 'svd', 'eig', 'randomized' or 'auto' (see :func:`round.truncated_svd()`). If None (default), the one set with :func:`round.set_svd_algorithm()`
         :param lstsq_algorithm: 'qr' (default) or 'lstsq'. The latter is more accurate but doesn't allow backpropagation
 
         :return: a :class:`Tensor`
         """
 
         assert lstsq_algorithm in ('qr', 'lstsq')
+        self._terms = None
         self.batch = batch
+        self._center = None
 
         if isinstance(data, (list, tuple)):
             if batch:
@@ -180,9 +267,8 @@ class Tensor(object):
 
                         # Sort eigenvectors in decreasing importance
                         if batch:
-                            reverse = torch.arange(len(eigvals[0])-1, -1, -1)
-                            idx = torch.argsort(eigvals)[:, reverse[:ranks_cp]]
-                            self.cores.append(eigvecs[[[i] for i in range(len(idx))], :, idx].transpose(-1, -2))
+                            idx = torch.argsort(eigvals, dim=-1, descending=True)[:, :ranks_cp]
+                            self.cores.append(torch.gather(eigvecs, 2, idx[:, None, :].expand(-1, eigvecs.shape[1], -1)))
                             if self.cores[-1].shape[2] < ranks_cp:  # Complete with random entries
                                 self.cores[-1] = torch.cat(
                                     (
@@ -217,41 +303,32 @@ class Tensor(object):
                 for iter in range(max_iter):
                     for n in range(self.dim()):
                         if batch:
-                            khatri = torch.ones(batch_size, 1, ranks_cp, device=device)
                             prod = torch.ones(batch_size, ranks_cp, ranks_cp, device=device)
-                            idxs = 'bir,bjr->bijr'
-                            shape = [batch_size, -1, ranks_cp]
                         else:
-                            khatri = torch.ones(1, ranks_cp, device=device)
                             prod = torch.ones(ranks_cp, ranks_cp, device=device)
-                            idxs = 'ir,jr->ijr'
-                            shape = [-1, ranks_cp]
 
                         for m in range(self.dim()-1, -1, -1):
                             if m != n:
                                 prod *= grams[m]
-                                khatri = torch.reshape(torch.einsum(idxs, (self.cores[m], khatri)), shape)
-
-                        unfolding = tn.unfolding(data, n, batch)
 
-                        unf_khatri_t = unfolding.matmul(khatri).transpose(-1, -2)
+                        mttkrp = _mttkrp(data, self.cores, n, batch)
+                        unf_khatri_t = mttkrp.transpose(-1, -2)
                         if lstsq_algorithm == 'qr':
                             self.cores[n] = lstsq(unf_khatri_t, prod)
                         else:
-                            if batch:
-                                self.cores[n] = torch.cat(
-                                    [torch.lstsq(unf_khatri_t[i], prod[i])[None, ...] for i in range(batch_size)]
-                                )
-                            else:
-                                self.cores[n] = torch.lstsq(unf_khatri_t, prod)
+                            self.cores[n] = _lstsq_exact(unf_khatri_t, prod)
 
                         grams[n] = self.cores[n].transpose(-1, -2).matmul(self.cores[n])
 
+                    # Error without reconstruction: ||X - Y||^2 = ||X||^2 - 2 <X, Y> + ||Y||^2, where <X, Y> reuses the
+                    # last MTTKRP and ||Y||^2 is the sum of the Hadamard product of all Gram matrices
+                    inner = torch.sum(mttkrp * self.cores[-1], dim=(-2, -1))
+                    normsq = torch.sum(prod * grams[-1], dim=(-2, -1))
                     if batch:
-                        err = data - tn.Tensor(self.cores, batch=self.batch).torch()
-                        errors.append((torch.sqrt(torch.sum(err**2, dim=list(range(1, err.dim())))) / data_norms).mean())
+                        err = torch.sqrt(torch.clamp(data_norms**2 - 2 * inner + normsq, min=0))
+                        errors.append((err / data_norms).mean())
                     else:
-                        errors.append(torch.norm(data - tn.Tensor(self.cores, batch=self.batch).torch()) / data_norm)
+                        errors.append(torch.sqrt(torch.clamp(data_norm**2 - 2 * inner + normsq, min=0)) / data_norm)
                     if len(errors) >= 2 and errors[-2] - errors[-1] < tol:
                         converged = True
                     if verbose:
@@ -304,13 +381,20 @@ class Tensor(object):
         if eps is not None: # TT-SVD (or TT-EIG) algorithm
             if ranks_cp is not None or ranks_tucker is not None or ranks_tt is not None:
                 raise ValueError('Specify eps or ranks, but not both')
-            self.round(eps)
+            self.round(eps, algorithm=algorithm)
 
     """
     Arithmetic operations
     """
 
     def __add__(self, other):
+        policy = tn.auto_round.active()
+        if policy is not None:
+            return policy.add(self, other)
+        return self._add(other)
+
+    def _add(self, other):
+        self._check_shared()
         if not isinstance(other, Tensor):
             factor = other
 
@@ -321,86 +405,11 @@ class Tensor(object):
 
             other.cores[0].data *= factor
         if self.dim() == 1: # Special case
-            return Tensor([self.decompress_tucker_factors().cores[0] + other.decompress_tucker_factors().cores[0]])
-
-        if self.batch:
-            idxs = 'bijk,baj->biak'
-        else:
-            idxs = 'ijk,aj->iak'
-
+            return _sum_dense([self, other])
+        if self.batch == other.batch and self.shape == other.shape:  # Assembled on first use (see :func:`_lazy_sum()`)
+            return _lazy_sum(self._summands() + other._summands())
         this, other = _broadcast(self, other)
-        cores = []
-        Us = []
-        for n in range(this.dim()):
-            core1 = this.cores[n]
-            core2 = other.cores[n]
-
-            # CP + CP -> CP, other combinations -> TT
-            if (core1.dim() == 3 and core2.dim() == 4 and self.batch) or (core1.dim() == 2 and core2.dim() == 2 and not self.batch):
-                core1 = core1[None, ...]
-                core2 = core2[None, ...]
-            else:
-                core1 = self._cp_to_tt(core1)
-                core2 = self._cp_to_tt(core2)
-
-            if this.Us[n] is not None and other.Us[n] is not None:
-                if self.batch:
-                    slice1 = torch.cat([core1, torch.zeros(core2.shape[0], core1.shape[1], core1.shape[2], core1.shape[3])], dim=1)
-                    slice1 = torch.cat([slice1, torch.zeros(core1.shape[0], core1.shape[1]+core2.shape[1], core1.shape[2], core2.shape[3])], dim=3)
-                    slice2 = torch.cat([torch.zeros(core1.shape[0], core1.shape[1], core2.shape[2], core2.shape[3]), core2], dim=1)
-                    slice2 = torch.cat([torch.zeros(core1.shape[0], core1.shape[1]+core2.shape[1], core2.shape[2], core1.shape[3]), slice2], dim=3)
-                    c = torch.cat([slice1, slice2], dim=2)
-                    Us.append(torch.cat((self.Us[n], other.Us[n]), dim=2))
-                else:
-                    slice1 = torch.cat([core1, torch.zeros([core2.shape[0], core1.shape[1], core1.shape[2]])], dim=0)
-                    slice1 = torch.cat([slice1, torch.zeros(core1.shape[0]+core2.shape[0], core1.shape[1], core2.shape[2])], dim=2)
-                    slice2 = torch.cat([torch.zeros([core1.shape[0], core2.shape[1], core2.shape[2]]), core2], dim=0)
-                    slice2 = torch.cat([torch.zeros(core1.shape[0]+core2.shape[0], core2.shape[1], core1.shape[2]), slice2], dim=2)
-                    c = torch.cat([slice1, slice2], dim=1)
-                    Us.append(torch.cat((self.Us[n], other.Us[n]), dim=1))
-
-                cores.append(c)
-                continue
-            if this.Us[n] is not None:
-                core1 = torch.einsum(idxs, (core1, self.Us[n]))
-            if other.Us[n] is not None:
-                core2 = torch.einsum(idxs, (core2, other.Us[n]))
-
-            if self.batch:
-                column1 = torch.cat([core1, torch.zeros([core2.shape[0], core2.shape[1], this.shape[n], core1.shape[3]], device=core1.device)], dim=1)
-                column2 = torch.cat([torch.zeros([core1.shape[0], core1.shape[1], this.shape[n], core2.shape[3]], device=core2.device), core2], dim=1)
-                c = torch.cat([column1, column2], dim=3)
-            else:
-                column1 = torch.cat([core1, torch.zeros([core2.shape[0], this.shape[n], core1.shape[2]], device=core1.device)], dim=0)
-                column2 = torch.cat([torch.zeros([core1.shape[0], this.shape[n], core2.shape[2]], device=core2.device), core2], dim=0)
-                c = torch.cat([column1, column2], dim=2)
-            cores.append(c)
-            Us.append(None)
-
-        # First core should have first size 1 (if it's TT)
-        if self.batch:
-            if not (this.cores[0].dim() == 3 and other.cores[0].dim() == 3):
-                cores[0] = torch.sum(cores[0], dim=1, keepdim=True)
-            # Similarly for the last core and last size
-            if not (this.cores[-1].dim() == 3 and other.cores[-1].dim() == 3):
-                cores[-1] = torch.sum(cores[-1], dim=3, keepdim=True)
-        else:
-            if not (this.cores[0].dim() == 2 and other.cores[0].dim() == 2):
-                cores[0] = torch.sum(cores[0], dim=0, keepdim=True)
-            # Similarly for the last core and last size
-            if not (this.cores[-1].dim() == 2 and other.cores[-1].dim() == 2):
-                cores[-1] = torch.sum(cores[-1], dim=2, keepdim=True)
-
-        # Set up cores that should be CP cores
-        for n in range(0, this.dim()):
-            if self.batch:
-                if this.cores[n].dim() == 3 and other.cores[n].dim() == 3:
-                    cores[n] = torch.sum(cores[n], dim=1, keepdim=False)
-            else:
-                if this.cores[n].dim() == 2 and other.cores[n].dim() == 2:
-                    cores[n] = torch.sum(cores[n], dim=0, keepdim=False)
-
-        return Tensor(cores, Us=Us)
+        return _sum_dense([this, other])
 
     def __radd__(self, other):
         if other is None:
@@ -417,10 +426,23 @@ class Tensor(object):
         return -1*self
 
     def __mul__(self, other):
+        policy = tn.auto_round.active()
+        if policy is not None:
+            return policy.mul(self, other)
+        return self._mul(other)
+
+    def _mul(self, other):
         if not isinstance(other, Tensor):  # A scalar
-            result = self.clone()
-            result.cores[0].data *= other
+            if self._terms is not None:
+                return _lazy_sum([term._mul(other) for term in self._terms])
+            result = self._shallow_copy()
+            result.cores[0] = result.cores[0]*other
             return result
+        self._check_shared()
+        other._check_shared()
+        if (self._terms is not None or other._terms is not None) and self.batch == other.batch and \
+                self.shape == other.shape:  # The product distributes over the terms of sums
+            return _lazy_sum([a._mul(b) for a in self._summands() for b in other._summands()])
         this, other = _broadcast(self, other)
         cores = []
         Us = []
@@ -428,12 +450,12 @@ class Tensor(object):
             core1 = this.cores[n]
             core2 = other.cores[n]
             # CP + CP -> CP, other combinations -> TT
+            cp = (False, False)
             if (core1.dim() == 2 and core2.dim() == 2 and not self.batch) or (core1.dim() == 3 and core2.dim() == 3 and self.batch):
-                core1 = core1[None, ...]
-                core2 = core2[None, ...]
+                core1 = core1[..., None, :, :]
+                core2 = core2[..., None, :, :]
             else:
-                core1 = this._cp_to_tt(core1)
-                core2 = this._cp_to_tt(core2)
+                cp = (core1.dim() == 2 + self.batch, core2.dim() == 2 + self.batch)
 
             # We do the product core along 3 axes, unless it would blow up
             if self.batch:
@@ -441,13 +463,6 @@ class Tensor(object):
                 d2 = 3
                 idx1 = 'gijk,gabc->giajbkc'
                 idx2 = 'bij,bik->bijk'
-                idx3 = 'bijk,baj->biak'
-                shape1 = (
-                    core1.shape[0]*core2.shape[0],
-                    core1.shape[1]*core2.shape[1],
-                    core1.shape[2]*core2.shape[2],
-                    core1.shape[3]*core2.shape[3]
-                )
                 if this.Us[n] is not None:
                     shape2 = (this.Us[n].shape[0], this.Us[n].shape[1], -1)
             else:
@@ -455,24 +470,25 @@ class Tensor(object):
                 d2 = 2
                 idx1 = 'ijk,abc->iajbkc'
                 idx2 = 'ij,ik->ijk'
-                idx3 = 'ijk,aj->iak'
-                shape1 = (
-                    core1.shape[0]*core2.shape[0],
-                    core1.shape[1]*core2.shape[1],
-                    core1.shape[2]*core2.shape[2]
-                )
                 if this.Us[n] is not None:
                     shape2 = (this.Us[n].shape[0], -1)
 
             if this.Us[n] is not None and other.Us[n] is not None and d1 < this.shape[n]:
+                core1 = this._cp_to_tt(core1)
+                core2 = this._cp_to_tt(core2)
+                shape1 = core1.shape[:-3] + (
+                    core1.shape[-3]*core2.shape[-3],
+                    core1.shape[-2]*core2.shape[-2],
+                    core1.shape[-1]*core2.shape[-1]
+                )
                 cores.append(torch.reshape(torch.einsum(idx1, (core1, core2)), shape1))
                 Us.append(torch.reshape(torch.einsum(idx2, (this.Us[n], other.Us[n])), shape2))
             else: # Decompress spatially, then do normal TT-TT slice-wise kronecker product
                 if this.Us[n] is not None:
-                    core1 = torch.einsum(idx3, (core1, this.Us[n]))
+                    core1 = _project_spatial(core1, this.Us[n], cp[0])
                 if other.Us[n] is not None:
-                    core2 = torch.einsum(idx3, (core2, other.Us[n]))
-                cores.append(_core_kron(core1, core2, self.batch))
+                    core2 = _project_spatial(core2, other.Us[n], cp[1])
+                cores.append(_core_kron(core1, core2, self.batch, cp=cp))
                 Us.append(None)
 
             if this.cores[n].dim() == d2 and other.cores[n].dim() == d2:
@@ -489,6 +505,8 @@ class Tensor(object):
         return tn.cross(function=lambda x, y: x / y, tensors=[tn.full_like(self, fill_value=other), self], verbose=False)
 
     def __pow__(self, power):
+        if tn.ops._is_integer_power(power):  # Exact, no cross-approximation needed
+            return tn.ops._integer_power(self, int(power))
         return tn.cross(function=lambda x, y: x**y, tensors=[self, tn.full_like(self, fill_value=power)], verbose=False)
 
     def __rmul__(self, other):
@@ -519,6 +537,67 @@ class Tensor(object):
     def __ne__(self, other):
         return not self == other
 
+    """
+    Cores and factors
+    """
+
+    @property
+    def cores(self):
+        """
+        The list of cores of this tensor (see :class:`Tensor`). If it is a sum whose assembly was deferred (see
+        :func:`_lazy_sum()`), it is assembled now.
+        """
+
+        self._assemble()
+        return self._cores
+
+    @cores.setter
+    def cores(self, value):
+        self._assemble()
+        self._cores = value
+
+    @property
+    def Us(self):
+        """
+        The list of Tucker factors of this tensor (None for modes without factor). If it is a sum whose assembly was
+        deferred (see :func:`_lazy_sum()`), it is assembled now.
+        """
+
+        self._assemble()
+        return self._Us
+
+    @Us.setter
+    def Us(self, value):
+        self._assemble()
+        self._Us = value
+
+    def _summands(self):
+        """
+        Returns the terms of this tensor if it is a sum whose assembly was deferred (see :func:`_lazy_sum()`), or a
+        list that only contains this tensor otherwise. Linear operations can be applied term by term, which never
+        touches the zero blocks of the assembled cores.
+
+        :return: a list of :class:`Tensor`
+        """
+
+        if self._terms is None:
+            return [self]
+        return self._terms
+
+    def _assemble(self):
+        """
+        If this tensor is a sum whose assembly was deferred (see :func:`_lazy_sum()`), assembles its block-diagonal
+        cores and factors, and forgets its terms.
+        """
+
+        if getattr(self, '_terms', None) is None:
+            return
+        self._check_shared()
+        t = _sum_dense(self._terms)
+        self._terms = None
+        self._cores = t.cores
+        self._Us = t.Us
+
     """
     Shapes and ranks
     """
@@ -531,6 +610,9 @@ class Tensor(object):
         :return: a PyTorch shape object
         """
 
+        if self._terms is not None:
+            return self._terms[0].shape
+
         shape = []
 
         if self.batch:
@@ -591,6 +673,8 @@ class Tensor(object):
         :return: an int
         """
 
+        if self._terms is not None:
+            return self._terms[0].dim()
         return len(self.cores)
 
     def size(self):
@@ -720,6 +804,10 @@ class Tensor(object):
 
         """
 
+        self._check_shared()
+        if self._terms is not None:  # A sum: its terms are indexed one by one
+            return _sum_terms([term[key] for term in self._terms])
+
         # Preprocessing
         if isinstance(key, Tensor):
             if torch.abs(tn.sum(key)-1) > 1e-8:
@@ -894,7 +982,7 @@ class Tensor(object):
             if this_mode == 'none':
                 if self.batch:
                     if batch_dim_processed:
-                        core = torch.cat([torch.eye(self.ranks_tt[counter - 1].item())[None, ...] for _ in range(batch_size)])
+                        core = torch.eye(self.ranks_tt[counter - 1].item(), device=self.cores[0].device)[None, ...].repeat(batch_size, 1, 1)
                         insert_core(
                             factors,
                             core[:, :, None, :],
@@ -1121,15 +1209,19 @@ class Tensor(object):
 
         return tn.Tensor(self.cores, batch=self.batch).torch()
 
-    def decompress_tucker_factors(self, dim='all', _clone=True):
+    def decompress_tucker_factors(self, dim='all', _clone=False):
         """
         Decompresses this tensor along the Tucker factors only.
 
+        The untouched cores and factors are shared with this tensor (copy-on-write, see :meth:`_share()`).
+
         :param dim: int, list, or 'all' (default)
 
         :return: a :class:`Tensor` in CP/TT format, without Tucker factors
         """
 
+        self._check_shared()
+
         if dim == 'all':
             dim = range(self.dim())
         if not hasattr(dim, '__len__'):
@@ -1161,7 +1253,10 @@ class Tensor(object):
                 else:
                     cores.append(self.cores[n])
                     Us.append(self.Us[n])
-        return tn.Tensor(cores, Us, idxs=self.idxs, batch=self.batch)
+        result = tn.Tensor(cores, Us, idxs=self.idxs, batch=self.batch)
+        if not _clone:
+            result._share(self)
+        return result
 
     def tt(self):
         """
@@ -1181,6 +1276,9 @@ class Tensor(object):
         :return: a PyTorch tensor
         """
 
+        if self._terms is not None:  # A sum: its terms are decompressed one by one
+            return _sum_terms([term.torch() for term in self._terms])
+
         t = self.decompress_tucker_factors(_clone=False)
 
         device = t.cores[0].device
@@ -1256,7 +1354,7 @@ class Tensor(object):
 
         if factor is None:
             if (self.cores[0].dim() == 3 and self.batch) or (self.cores[0].dim() == 2 and not self.batch):
-                self.cores[0] = self.cores[0][None, ...]
+                self.cores[0] = self.cores[0][..., None, :, :]
             for mu in range(1, self.dim()-1):
                 self.cores[mu] = self._cp_to_tt(self.cores[mu])
 
@@ -1267,18 +1365,7 @@ class Tensor(object):
         if (factor.dim() == 3 and not self.batch) or (factor.dim() == 4 and self.batch):  # Already a TT core
             return factor
 
-        if self.batch:
-            shape1 = (factor.shape[0], factor.shape[2], factor.shape[2] + 1, factor.shape[1])
-            shape2 = (factor.shape[0], factor.shape[2] + 1, factor.shape[2], factor.shape[1])
-            order = (0, 1, 3, 2)
-        else:
-            shape1 = (factor.shape[1], factor.shape[1] + 1, factor.shape[0])
-            shape2 = (factor.shape[1] + 1, factor.shape[1], factor.shape[0])
-            order = (0, 2, 1)
-
-        core = torch.zeros(shape1)
-        core[..., 0, :] = factor.transpose(-1, -2)
-        return core.reshape(shape2).permute(order)[..., :-1, :, :]
+        return torch.diag_embed(factor, dim1=-3, dim2=-1)
 
     """
     Rounding and orthogonalization
@@ -1402,24 +1489,81 @@ class Tensor(object):
         else:
             L = torch.ones(1, 1)
             R = torch.ones(1, 1)
-        for i in range(mu):
-            R = self.left_orthogonalize(i)
-        for i in range(self.dim()-1, mu, -1):
-            L = self.right_orthogonalize(i)
+        center = self._orthogonality_center()
+        if center is None:
+            for i in range(mu):
+                R = self.left_orthogonalize(i)
+            for i in range(self.dim()-1, mu, -1):
+                L = self.right_orthogonalize(i)
+        else:  # Only move the center from where it already is
+            for i in range(center, mu):
+                R = self.left_orthogonalize(i)
+            for i in range(center, mu, -1):
+                L = self.right_orthogonalize(i)
+        self.factor_orthogonalize(mu)
+        self._set_orthogonality_center(mu)
         return R, L
 
-    def round_tucker(self, eps=1e-14, rmax=None, dim='all', algorithm='svd'):
+    def _orthogonality_center(self):
+        """
+        Returns the orthogonality center of this tensor, if known: an index `mu` such that all cores before it are
+        left-orthogonal, all cores after it are right-orthogonal, and all Tucker factors have orthonormal columns.
+        The norm of the tensor is then the norm of its `mu`-th core.
+
+        The center is recorded by the orthogonalization and rounding methods, and it is forgotten as soon as any core
+        or factor is replaced or modified in place (modifications through `.data` cannot be detected).
+
+        :return: an int, or None if unknown
+        """
+
+        record = getattr(self, '_center', None)
+        if record is None or self._terms is not None:
+            return None
+        mu, refs = record
+        nodes = self.cores + self.Us
+        if len(refs) != len(nodes):
+            self._center = None
+            return None
+        for ref, node in zip(refs, nodes):
+            if ref is None and node is None:
+                continue
+            if ref is None or node is None or ref[0]() is not node or ref[1] != node._version:
+                self._center = None
+                return None
+        return mu
+
+    def _set_orthogonality_center(self, mu):
+        """
+        Records that this tensor is `mu`-orthogonal (see :meth:`_orthogonality_center()`).
+
+        :param mu: an int between 0 and N-1
+        """
+
+        refs = [None if node is None else (weakref.ref(node), node._version) for node in self.cores + self.Us]
+        self._center = (mu, refs)
+
+    def round_tucker(self, eps=1e-14, rmax=None, dim='all', algorithm=None):
         """
         Tries to recompress this tensor in place by reducing its Tucker ranks.
 
         Note: this method will turn CP (or CP-Tucker) cores into TT (or TT-Tucker) ones.
 
+        Modes without a factor are treated as implicit identities: no :math:`I \\times I` matrix is formed, and only the
+        truncated factor (size :math:`I \\times S`) is allocated.
+
+        With `algorithm='randomized'` (or 'auto', for large modes and small `rmax`), each factor is found with a
+        randomized range finder on the product of the current factor and core, which is never formed: the cost per
+        mode is :math:`O(I R_{n-1} R_n r)` instead of :math:`O(I (R_{n-1} R_n)^2)`. Note that the error bound then only
+        accounts for the part of the tensor captured by the sketch.
+
         :param eps: this relative error will not be exceeded
         :param rmax: all ranks should be rmax at most (default: no limit)
-        :param algorithm: 'svd' (default) or 'eig'. The latter can be faster, but less accurate
+        :param algorithm: SVD backend: 'svd', 'eig', 'randomized' or 'auto' (see :func:`round.truncated_svd()`). If None (default), the one set with :func:`round.set_svd_algorithm()`
         :param verbose:
         """
 
+        self._check_shared()
+
         N = self.dim()
 
         if not hasattr(rmax, '__len__'):
@@ -1430,24 +1574,33 @@ class Tensor(object):
         if not hasattr(dim, '__len__'):
             dim = [dim]*N
 
-        if self.batch:
-            batch_size = self.cores[0].shape[0]
+        if algorithm is None:
+            algorithm = tn.get_svd_algorithm()
 
         for m in dim:
             self.cores[m] = self._cp_to_tt(self.cores[m])
         self.orthogonalize(-1)
         for mu in range(N-1, -1, -1):
-            if self.Us[mu] is None:
-                device = self.cores[mu].device
-
+            core = self.cores[mu]
+            if self.batch:
+                C = torch.reshape(core.permute(0, 1, 3, 2), [core.shape[0], -1, core.shape[2]])
+            else:
+                C = torch.reshape(core.permute(0, 2, 1), [-1, core.shape[1]])
+            size = min(self.shape[mu + 1] if self.batch else self.shape[mu], C.shape[-2])
+            if rmax[mu] is not None and (algorithm == 'randomized' and rmax[mu] + 10 < size or
+                                         algorithm == 'auto' and 4*(rmax[mu] + 10) <= size):
+                # Sketch the factor's range, then truncate the small projected matrix
+                Q, Bt = _randomized_range(self.Us[mu], C, int(rmax[mu]) + 10)
+                left, right = tn.truncated_svd(Bt.transpose(-1, -2), eps=eps/np.sqrt(len(dim)), rmax=rmax[mu],
+                                               left_ortho=True, algorithm='svd', batch=self.batch)
+                self.Us[mu] = torch.matmul(Q, left)
                 if self.batch:
-                    self.Us[mu] = torch.cat(
-                        [
-                            torch.eye(self.shape[mu + 1])[None, ...].to(device) for _ in range(batch_size)
-                        ]
-                    )
+                    self.cores[mu] = torch.reshape(right.transpose(-1, -2), [core.shape[0], core.shape[1], core.shape[3], -1]).permute(0, 1, 3, 2)
                 else:
-                    self.Us[mu] = torch.eye(self.shape[mu]).to(device)
+                    self.cores[mu] = torch.reshape(right.transpose(-1, -2), [core.shape[0], core.shape[2], -1]).permute(0, 2, 1)
+                if mu > 0:
+                    self.right_orthogonalize(mu)
+                continue
 
             # Send non-orthogonality to factor
             if self.batch:
@@ -1457,7 +1610,10 @@ class Tensor(object):
                 Q, R = torch.qr(torch.reshape(self.cores[mu].permute(0, 2, 1), [-1, self.cores[mu].shape[1]]))
                 self.cores[mu] = torch.reshape(Q, [self.cores[mu].shape[0], self.cores[mu].shape[2], -1]).permute(0, 2, 1)
 
-            self.Us[mu] = torch.matmul(self.Us[mu], R.transpose(-1, -2))
+            if self.Us[mu] is None:  # Implicit identity: the factor is just R^T (size I x min(I, R_{n-1} R_n))
+                self.Us[mu] = R.transpose(-1, -2)
+            else:
+                self.Us[mu] = torch.matmul(self.Us[mu], R.transpose(-1, -2))
 
             # Split factor according to error budget
             left, right = tn.truncated_svd(self.Us[mu], eps=eps/np.sqrt(len(dim)), rmax=rmax[mu],
@@ -1473,8 +1629,9 @@ class Tensor(object):
             # Prepare next iteration
             if mu > 0:
                 self.right_orthogonalize(mu)
+        self._set_orthogonality_center(0)
 
-    def round_tt(self, eps=1e-14, rmax=None, algorithm='svd', verbose=False):
+    def round_tt(self, eps=1e-14, rmax=None, algorithm=None, verbose=False):
         """
         Tries to recompress this tensor in place by reducing its TT ranks.
 
@@ -1482,26 +1639,60 @@ class Tensor(object):
 
         :param eps: this relative error will not be exceeded
         :param rmax: all ranks should be rmax at most (default: no limit)
-        :param algorithm: 'svd' (default) or 'eig'. The latter can be faster, but less accurate
+        :param algorithm: SVD backend: 'svd', 'eig', 'randomized' or 'auto' (see :func:`round.truncated_svd()`). If None (default), the one set with :func:`round.set_svd_algorithm()`
         :param verbose:
         """
 
+        self._check_shared()
+
         N = self.dim()
         if not hasattr(rmax, '__len__'):
             rmax = [rmax]*(N-1)
         assert len(rmax) == N-1
 
         self._cp_to_tt()
+        if N > 1 and self._orthogonality_center() == 0:
+            # Already right-orthogonal (e.g. after a previous rounding): truncate from left to right instead
+            self._round_tt_sweep(eps, rmax, algorithm, verbose, left_to_right=True)
+            self._set_orthogonality_center(N-1)
+            return
         start = time.time()
         self.orthogonalize(N-1)  # Make everything left-orthogonal
         if verbose:
             print('Orthogonalization time:', time.time() - start)
-        if self.batch:
-            delta = None
+        self._round_tt_sweep(eps, rmax, algorithm, verbose, left_to_right=False)
+        self._set_orthogonality_center(0)
+
+    def _round_tt_sweep(self, eps, rmax, algorithm, verbose, left_to_right):
+        """
+        Truncation sweep of TT rounding, for a tensor whose orthogonality center is at its first core (if
+        `left_to_right`) or its last core (otherwise). Afterwards, the center is at the opposite end.
+        """
+
+        N = self.dim()
+        if left_to_right:
+            center = 0
+        else:
+            center = N-1
+        if self.batch:  # One error budget per batch element
+            core = self.cores[center]
+            delta = eps/max(1, np.sqrt(N-1))*torch.sqrt(torch.sum(core.reshape(core.shape[0], -1)**2, dim=1))
         else:
-            delta = eps/max(1, torch.sqrt(torch.tensor([N-1], dtype=torch.float64)))*torch.norm(self.cores[-1])
+            delta = eps/max(1, torch.sqrt(torch.tensor([N-1], dtype=torch.float64)))*torch.norm(self.cores[center])
             delta = delta.item()
 
+        if left_to_right:
+            for mu in range(N - 1):
+                M = tn.left_unfolding(self.cores[mu], batch=self.batch)
+                left, right = tn.truncated_svd(M, delta=delta, rmax=rmax[mu], left_ortho=True, algorithm=algorithm, verbose=verbose, batch=self.batch)
+
+                self.cores[mu] = torch.reshape(left, self.cores[mu].shape[:-1] + (-1, ))
+                if self.batch:
+                    self.cores[mu+1] = torch.einsum('bij,bjkl->bikl', (right, self.cores[mu+1]))  # Pass factor to the right
+                else:
+                    self.cores[mu+1] = torch.einsum('ij,jkl->ikl', (right, self.cores[mu+1]))  # Pass factor to the right
+            return
+
         for mu in range(N - 1, 0, -1):
             M = tn.right_unfolding(self.cores[mu], batch=self.batch)
             left, right = tn.truncated_svd(M, delta=delta, rmax=rmax[mu-1], left_ortho=False, algorithm=algorithm, verbose=verbose, batch=self.batch)
@@ -1513,20 +1704,103 @@ class Tensor(object):
                 self.cores[mu] = torch.reshape(right, [-1, self.cores[mu].shape[1], self.cores[mu].shape[2]])
                 self.cores[mu-1] = torch.einsum('ijk,kl', (self.cores[mu-1], left))  # Pass factor to the left
 
-    def round(self, eps=1e-14, **kwargs):
+    def round(self, eps=1e-14, rmax=None, algorithm=None, verbose=False, rmax_tucker=None, dim='all'):
         """
-        General recompression. Attempts to reduce TT ranks first; then does Tucker rounding with the remaining error
-        budget.
+        General recompression: reduces both the TT ranks and the Tucker ranks in a single sweep.
+
+        The tensor is made left-orthogonal, and then each core is visited once, from last to first, while it is the
+        orthogonality center: first its Tucker factor is truncated (via an SVD of the core's spatial unfolding), then
+        its left TT rank. All truncations are orthogonal projections, so their squared errors add up: each one may
+        spend the unused part of the shared error budget, divided evenly among the truncations still to come.
 
         :param eps: this relative error will not be exceeded
-        :param kwargs: passed to `round_tt()` and `round_tucker()`
+        :param rmax: an integer (or list of N-1 integers, one per TT bond): all TT ranks should be rmax at most. If an
+            integer, it also limits the Tucker ranks, unless `rmax_tucker` is given (default: no limit)
+        :param algorithm: SVD backend: 'svd', 'eig', 'randomized' or 'auto' (see :func:`round.truncated_svd()`). If None (default), the one set with :func:`round.set_svd_algorithm()`
+        :param verbose: Boolean
+        :param rmax_tucker: an integer (or list of N integers): all Tucker ranks should be rmax_tucker at most
+        :param dim: modes whose Tucker ranks are truncated (as in :meth:`round_tucker()`). Default is 'all'
         """
 
-        copy = self.clone()
-        self.round_tt(eps, **kwargs)
-        reached = tn.relative_error(copy, self)
-        if reached < eps:
-            self.round_tucker((1+eps) / (1+reached) - 1, **kwargs)
+        self._check_shared()
+
+        N = self.dim()
+        if rmax_tucker is None and not hasattr(rmax, '__len__'):
+            rmax_tucker = rmax
+        if not hasattr(rmax, '__len__'):
+            rmax = [rmax]*(N-1)
+        if not hasattr(rmax_tucker, '__len__'):
+            rmax_tucker = [rmax_tucker]*N
+        if len(rmax) != N-1:
+            raise ValueError('Expected {} TT ranks, got {}'.format(N-1, len(rmax)))
+        if len(rmax_tucker) != N:
+            raise ValueError('Expected {} Tucker ranks, got {}'.format(N, len(rmax_tucker)))
+        if dim == 'all':
+            dim = range(N)
+        if not hasattr(dim, '__len__'):
+            dim = [dim]
+        dim = set(dim)
+
+        self._cp_to_tt()
+        start = time.time()
+        self.orthogonalize(N-1)
+        if verbose:
+            print('Orthogonalization time:', time.time() - start)
+
+        def normsq(M):  # One value per batch element, in batch mode
+            if self.batch:
+                return torch.sum(M.reshape(M.shape[0], -1)**2, dim=1).detach()
+            return torch.sum(M**2).item()
+
+        budget = eps**2 * normsq(self.cores[-1])
+        spent = 0
+        steps = len(dim) + N - 1  # Truncations still to do (Tucker factors and N-1 TT bonds)
+
+        def delta():
+            if self.batch:
+                return torch.sqrt(torch.clamp(budget - spent, min=0) / steps)
+            return np.sqrt(max(budget - spent, 0) / steps)
+
+        for mu in range(N-1, -1, -1):
+            core = self.cores[mu]
+            if mu in dim:
+                # Tucker truncation: the core's spatial unfolding is split into an orthonormal part (absorbed by the
+                # factor) and the rest (which stays in the core)
+                if self.batch:
+                    M = core.permute(0, 2, 1, 3).reshape(core.shape[0], core.shape[2], -1)
+                else:
+                    M = core.permute(1, 0, 2).reshape(core.shape[1], -1)
+                left, right, discarded = tn.truncated_svd(M, delta=delta(), rmax=rmax_tucker[mu], left_ortho=True,
+                                                          algorithm=algorithm, verbose=verbose, batch=self.batch,
+                                                          _discarded=True)
+                spent += discarded
+                steps -= 1
+                if self.Us[mu] is None:  # Implicit identity: only the truncated factor is allocated
+                    self.Us[mu] = left
+                else:
+                    self.Us[mu] = torch.matmul(self.Us[mu], left)
+                if self.batch:
+                    core = right.reshape(core.shape[0], -1, core.shape[1], core.shape[3]).permute(0, 2, 1, 3)
+                else:
+                    core = right.reshape(-1, core.shape[0], core.shape[2]).permute(1, 0, 2)
+                self.cores[mu] = core
+            if mu == 0:
+                break
+
+            # TT truncation: the right part stays (right-orthogonal), the rest moves to the left neighbor
+            M = tn.right_unfolding(core, batch=self.batch)
+            left, right, discarded = tn.truncated_svd(M, delta=delta(), rmax=rmax[mu-1], left_ortho=False,
+                                                      algorithm=algorithm, verbose=verbose, batch=self.batch,
+                                                      _discarded=True)
+            spent += discarded
+            steps -= 1
+            if self.batch:
+                self.cores[mu] = torch.reshape(right, [core.shape[0], -1, core.shape[2], core.shape[3]])
+                self.cores[mu-1] = torch.einsum('bijk,bkl->bijl', (self.cores[mu-1], left))
+            else:
+                self.cores[mu] = torch.reshape(right, [-1, core.shape[1], core.shape[2]])
+                self.cores[mu-1] = torch.einsum('ijk,kl', (self.cores[mu-1], left))
+        self._set_orthogonality_center(0)
 
     """
     Convenience "methods"
@@ -1600,12 +1874,12 @@ class Tensor(object):
         for m in dim:
             if self.Us[m] is None:
                 if self.batch:
-                    self.Us[m] = torch.cat([tn.generate_basis(name, (self.shape[m], self.shape[m]))[None, ...] for _ in range(self.shape[0])])
+                    self.Us[m] = tn.generate_basis(name, (self.shape[m + 1], self.shape[m + 1]))[None, ...].repeat(self.shape[0], 1, 1)
                 else:
                     self.Us[m] = tn.generate_basis(name, (self.shape[m], self.shape[m]))
             else:
                 if self.batch:
-                    torch.cat([tn.generate_basis(name, self.Us[m].shape)[None, ...] for _ in range(self.shape[0])])
+                    self.Us[m] = tn.generate_basis(name, self.Us[m].shape[1:])[None, ...].repeat(self.shape[0], 1, 1)
                 else:
                     self.Us[m] = tn.generate_basis(name, self.Us[m].shape)
             self.Us[m].requires_grad = requires_grad
@@ -1647,8 +1921,190 @@ class Tensor(object):
             else:
                 Us.append(self.Us[n].clone())
         if hasattr(self, 'idxs'):
-            return tn.Tensor(cores, Us=Us, idxs=self.idxs, batch=self.batch)
-        return tn.Tensor(cores, Us=Us, batch=self.batch)
+            t = tn.Tensor(cores, Us=Us, idxs=self.idxs, batch=self.batch)
+        else:
+            t = tn.Tensor(cores, Us=Us, batch=self.batch)
+        center = self._orthogonality_center()
+        if center is not None:
+            t._set_orthogonality_center(center)
+        return t
+
+    def __getstate__(self):
+        # Sharing records and the orthogonality center hold weak references, which cannot be pickled
+        state = dict(self.__dict__)
+        state.pop('_shared', None)
+        state.pop('_center', None)
+        return state
+
+    def __setstate__(self, state):
+        state = dict(state)
+        for name in ('cores', 'Us'):  # Tensors pickled before `cores` and `Us` became properties
+            if name in state:
+                state['_' + name] = state.pop(name)
+        state.setdefault('_terms', None)
+        self.__dict__.update(state)
+
+    def _shallow_copy(self):
+        """
+        Creates a copy of this tensor that shares its cores and factors with it (copy-on-write, see :meth:`_share()`),
+        in O(N).
+
+        :return: another compressed tensor
+        """
+
+        if self._terms is not None:
+            return _lazy_sum(self._terms)
+        t = tn.Tensor(list(self.cores), Us=list(self.Us), idxs=self.idxs, batch=self.batch)
+        t._share(self)
+        center = self._orthogonality_center()
+        if center is not None:
+            t._set_orthogonality_center(center)
+        return t
+
+    def _share(self, other):
+        """
+        Records which cores and factors this tensor holds in common with another one (same memory, e.g. the nodes an
+        operation left untouched). Such nodes are copy-on-write:
+
+        - Library code replaces nodes (`t.cores[n] = ...`), or makes them private with :meth:`_writable()` before
+          writing into them
+        - Any other in-place modification of a shared node is detected by :meth:`_check_shared()`, which raises
+
+        Tensors that hold no more nodes in common (because they were replaced or garbage-collected) stop being tracked.
+
+        :param other: a :class:`Tensor`
+        """
+
+        self._check_shared()
+        other._check_shared()
+        theirs = {}
+        for node in other.cores + other.Us:
+            if node is not None and node.numel() > 0:
+                theirs[node.data_ptr()] = node
+        for node in self.cores + self.Us:
+            if node is None or node.numel() == 0 or node.data_ptr() not in theirs:
+                continue
+            record = other._share_record(theirs[node.data_ptr()])
+            mine = self._share_record(node)
+            if mine is record:
+                continue
+            for holder in mine:  # Merge both records into one
+                t = holder[0]()
+                if t is not None:
+                    t._shared[node.data_ptr()] = record
+                record.append(holder)
+
+    def _share_record(self, node):
+        """
+        Returns the sharing record of one of this tensor's nodes: a list of [tensor weakref, node weakref, version] for
+        all tensors that hold its memory. It is created if needed.
+        """
+
+        if getattr(self, '_shared', None) is None:
+            self._shared = {}
+        record = self._shared.get(node.data_ptr())
+        if record is None or not any([h[0]() is self and h[1]() is node for h in record]):
+            record = [[weakref.ref(self), weakref.ref(node), node._version]]
+            self._shared[node.data_ptr()] = record
+        return record
+
+    def _check_shared(self):
+        """
+        Raises an error if a node that this tensor shares with another one (see :meth:`_share()`) was modified in
+        place, since that modified both tensors. Nodes that are no longer shared are forgotten.
+        """
+
+        for term in getattr(self, '_terms', None) or []:
+            term._check_shared()
+        shared = getattr(self, '_shared', None)
+        if not shared:
+            return
+        held = {}  # For each holder tensor, the ids of its current nodes
+        for key, record in list(shared.items()):
+            active = []
+            for holder in record:
+                t = holder[0]()
+                node = holder[1]()
+                if t is None or node is None:
+                    continue
+                if id(t) not in held:
+                    held[id(t)] = set([id(x) for x in t.cores + t.Us])
+                if id(node) in held[id(t)]:
+                    active.append(holder)
+            record[:] = active
+            if not any([h[0]() is self for h in active]) or len(active) < 2:
+                del shared[key]
+                continue
+            if any([h[1]()._version != h[2] for h in active]):
+                raise RuntimeError('A core or factor shared with another tensor was modified in place, which modified '
+                                   'both tensors. Call clone() before writing into the nodes of a tensor')
+
+    def _writable(self, n, factor=False):
+        """
+        Copy-on-write: makes the `n`-th core (or factor) of this tensor private before it is modified in place.
+
+        :param n: an int
+        :param factor: if True, the Tucker factor is returned instead of the core
+
+        :return: the node, which can now be written into
+        """
+
+        self._check_shared()
+        nodes = self.Us if factor else self.cores
+        if nodes[n].data_ptr() in getattr(self, '_shared', {}):
+            center = self._orthogonality_center()
+            nodes[n] = nodes[n].clone()
+            if center is not None:
+                self._set_orthogonality_center(center)
+        return nodes[n]
+
+    def unbind_batch(self):
+        """
+        Splits a batch tensor into a list of tensors, one per batch element (the inverse of :func:`tools.stack()`).
+
+        Rank indices that an element does not use, i.e. whose slices are zero on either side of the bond (as the
+        padding introduced by :func:`tools.stack()` or by batched rounding), are dropped.
+
+        :return: a list of :class:`Tensor`
+        """
+
+        if not self.batch:
+            raise ValueError('unbind_batch() requires a batch tensor')
+
+        def used(core, side):  # Which rank indices of a core are not entirely zero
+            if core.dim() == 2:
+                return torch.sum(torch.abs(core), dim=0) > 0
+            if side == 'left':
+                return torch.sum(torch.abs(core.reshape(core.shape[0], -1)), dim=1) > 0
+            return torch.sum(torch.abs(core.reshape(-1, core.shape[-1])), dim=0) > 0
+
+        N = self.dim()
+        result = []
+        for b in range(self.shape[0]):
+            cores = [c[b] for c in self.cores]
+            Us = [None if U is None else U[b] for U in self.Us]
+            keep = [used(cores[n], 'right') & used(cores[n+1], 'left') for n in range(N-1)]
+            # The rank of a CP core is shared by both of its bonds
+            for n in list(range(1, N-1)) + list(range(N-2, 0, -1)):
+                if cores[n].dim() == 2:
+                    keep[n-1] = keep[n] = keep[n-1] & keep[n]
+            for n in range(N-1):
+                if not torch.any(keep[n]):
+                    keep[n][0] = True
+                keep[n] = torch.nonzero(keep[n])[:, 0]
+            for n in range(N):
+                if cores[n].dim() == 2:
+                    if n < N-1:
+                        cores[n] = cores[n][:, keep[n]]
+                    elif n > 0:
+                        cores[n] = cores[n][:, keep[n-1]]
+                else:
+                    if n > 0:
+                        cores[n] = cores[n][keep[n-1]]
+                    if n < N-1:
+                        cores[n] = cores[n][..., keep[n]]
+            result.append(Tensor(cores, Us=Us))
+        return result
 
     def numel(self):
         """
@@ -1673,11 +2129,17 @@ class Tensor(object):
                 result += self.Us[n].numel()
         return result
 
-    def repeat(self, *rep):
+    def repeat(self, *rep, _expand=False):
         """
         Returns another tensor repeated along one or more axes; works like PyTorch's `repeat()`.
 
+        The modes that are not repeated share their cores and factors with this tensor (copy-on-write, see
+        :meth:`_share()`).
+
         :param rep: a list, possibly longer than the tensor's number of dimensions
+        :param _expand: if True, modes of size 1 (and new trailing modes) are repeated without copying: their nodes
+            become stride-0 views (see PyTorch's `expand()`), which must not be stored nor modified in place. For
+            internal use only
 
         :return: another tensor
         """
@@ -1685,44 +2147,219 @@ class Tensor(object):
         assert len(rep) >= self.dim()
         assert all([r >= 1 for r in rep])
 
-        t = self.clone()
+        t = self._shallow_copy()
         if len(rep) > self.dim():  # If requested, we add trailing new dimensions. We use CP as is cheaper
             for n in range(self.dim(), len(rep)):
-                t.cores.append(torch.ones(rep[n], self.cores[-1].shape[-1]))
+                core = torch.ones(1, self.cores[-1].shape[-1]).expand(rep[n], -1)
+                if not _expand:
+                    core = core.contiguous()
+                t.cores.append(core)
                 t.Us.append(None)
         for n in range(self.dim()):
+            if rep[n] == 1:
+                continue
             if t.Us[n] is not None:
-                t.Us[n] = t.Us[n].repeat(rep[n], 1)
+                node = t.Us[n]
             else:
-                if self.batch:
-                    if t.cores[n].dim() == 4:
-                        t.cores[n] = t.cores[n].repeat(1, 1, rep[n], 1)
-                    else:
-                        t.cores[n] = t.cores[n].repeat(1, rep[n], 1)
-                else:
-                    if t.cores[n].dim() == 3:
-                        t.cores[n] = t.cores[n].repeat(1, rep[n], 1)
-                    else:
-                        t.cores[n] = t.cores[n].repeat(rep[n], 1)
+                node = t.cores[n]
+            # The spatial mode is the second to last one, for TT and CP cores and for factors alike
+            if node.shape[-2] == 1 and _expand:
+                node = node.expand(node.shape[:-2] + (rep[n], node.shape[-1]))
+            else:
+                node = node.repeat([1]*(node.dim()-2) + [rep[n], 1])
+            if t.Us[n] is not None:
+                t.Us[n] = node
+            else:
+                t.cores[n] = node
         return t
 
 
 def _broadcast(a, b):
+    """
+    Makes two tensors' shapes match by repeating them (see :meth:`Tensor.repeat()`). Singleton modes, the usual case,
+    are broadcast without copying their cores.
+    """
+
     if a.shape == b.shape:
         return a, b
     elif a.dim() != b.dim():
         raise ValueError('Cannot broadcast: lhs has {} dimensions, rhs has {}'.format(a.dim(), b.dim()))
-    result1 = a.repeat(*[int(round(max(sh2 / sh1, 1))) for sh1, sh2 in zip(a.shape, b.shape)])
-    result2 = b.repeat(*[int(round(max(sh1 / sh2, 1))) for sh1, sh2 in zip(a.shape, b.shape)])
+    shape1 = a.shape[1:] if a.batch else a.shape  # Batch sizes must coincide: only modes are repeated
+    shape2 = b.shape[1:] if b.batch else b.shape
+    result1 = a.repeat(*[int(round(max(sh2 / sh1, 1))) for sh1, sh2 in zip(shape1, shape2)], _expand=True)
+    result2 = b.repeat(*[int(round(max(sh1 / sh2, 1))) for sh1, sh2 in zip(shape1, shape2)], _expand=True)
     return result1, result2
 
 
-def _core_kron(a, b, batch=False):
+def _project_spatial(core, U, cp=False):
+    """
+    Absorbs a Tucker factor into a core's spatial mode. Works for both regular and batch cores (leading batch mode).
+
+    :param core: a TT core, or a CP factor if `cp` is True
+    :param U: a Tucker factor (or batch of factors)
+    :param cp: whether `core` is a CP factor (default is False)
+
+    :return: a core of the same kind, with spatial size U.shape[-2]
+    """
+
+    if cp:
+        return torch.matmul(U, core)
+    return torch.matmul(U[..., None, :, :], core)
+
+
+def _lazy_sum(ts):
+    """
+    Sums several tensors of equal shape, but defers the assembly of the sum's cores: their off-diagonal blocks are
+    zero, so the terms are kept instead (see :meth:`Tensor._summands()`). Terms that are lazy sums themselves are
+    flattened, and the others are kept as copy-on-write copies (see :meth:`Tensor._share()`). Linear operations
+    (:meth:`Tensor.torch()`, indexing, :func:`metrics.dot()`, products with scalars and tensors) work term by term;
+    anything else assembles the dense cores on first use of :attr:`Tensor.cores` or :attr:`Tensor.Us`.
+
+    :param ts: a list of :class:`Tensor`, all with the same shape (and the same `batch` flag)
+
+    :return: a :class:`Tensor`
+    """
+
+    terms = []
+    for t in ts:
+        if t._terms is not None:
+            terms.extend(t._terms)
+        else:
+            terms.append(t._shallow_copy())
+    result = Tensor.__new__(Tensor)
+    result._terms = terms
+    result.batch = terms[0].batch
+    result._center = None
+    result.idxs = [torch.arange(sh) for sh in result.shape]
+    return result
+
+
+def _sum_terms(results):
+    """
+    Adds up the results of an operation that was applied to each term of a sum (see :func:`_lazy_sum()`).
+
+    :param results: a list of PyTorch tensors or scalars, or a list of :class:`Tensor` (which are summed lazily)
+
+    :return: a PyTorch tensor, a scalar, or a :class:`Tensor`
+    """
+
+    if isinstance(results[0], Tensor):
+        return _lazy_sum(results)
+    result = results[0]
+    for r in results[1:]:
+        result = result + r
+    return result
+
+
+def _sum_dense(ts):
+    """
+    Assembles the sum of several tensors of equal shape: each core is block-diagonal (see :func:`_core_blocks()`),
+    with one block per term. Factors are stacked when all terms have one, and absorbed into the cores otherwise.
+
+    :param ts: a list of :class:`Tensor`
+
+    :return: a :class:`Tensor`
+    """
+
+    batch = ts[0].batch
+    if ts[0].dim() == 1:  # Special case
+        return Tensor([_sum_terms([t.decompress_tucker_factors().cores[0] for t in ts])], batch=batch)
+
     if batch:
+        core_dim = 4
+    else:
+        core_dim = 3
+
+    cores = []
+    Us = []
+    for n in range(ts[0].dim()):
+        nodes = [t.cores[n] for t in ts]
+        factors = [t.Us[n] for t in ts]
+
+        # CP + CP -> CP, other combinations -> TT (CP factors are written into the diagonals directly)
+        cp = [node.dim() == core_dim - 1 for node in nodes]
+        if all(cp):
+            nodes = [node[..., None, :, :] for node in nodes]
+            cp = [False] * len(ts)
+
+        if all([U is not None for U in factors]):
+            cores.append(_core_blocks(nodes, stack_spatial=True, cp=cp))
+            Us.append(torch.cat(factors, dim=-1))
+            continue
+        nodes = [node if U is None else _project_spatial(node, U, c) for node, U, c in zip(nodes, factors, cp)]
+        cores.append(_core_blocks(nodes, cp=cp))
+        Us.append(None)
+
+    # First core should have first size 1 (if it's TT)
+    b = int(batch)
+    if not all([t.cores[0].dim() == core_dim - 1 for t in ts]):
+        cores[0] = torch.sum(cores[0], dim=b, keepdim=True)
+    # Similarly for the last core and last size
+    if not all([t.cores[-1].dim() == core_dim - 1 for t in ts]):
+        cores[-1] = torch.sum(cores[-1], dim=b + 2, keepdim=True)
+
+    # Set up cores that should be CP cores
+    for n in range(len(cores)):
+        if all([t.cores[n].dim() == core_dim - 1 for t in ts]):
+            cores[n] = torch.sum(cores[n], dim=b, keepdim=False)
+
+    return Tensor(cores, Us=Us, batch=batch)
+
+
+def _core_blocks(cores, stack_spatial=False, cp=None):
+    """
+    Assembles the core of a sum of tensors: a block-diagonal core (along both rank modes) with one block per term. The
+    result is allocated once and the blocks are written in place, so no intermediate zero-padded slices are created.
+    CP factors are written straight into the diagonal of their block, without expanding them into a TT core first.
+    Works for both regular and batch cores (leading batch mode).
+
+    :param cores: a list of TT cores (or batch of TT cores)
+    :param stack_spatial: if True, the spatial sizes are stacked too (as needed for Tucker cores); otherwise they must
+        coincide
+    :param cp: list of bools: whether each core is a CP factor instead of a TT core (default: none is)
+
+    :return: a core whose ranks are the sums of the left (resp. right) ranks of `cores`
+    """
+
+    def sizes(core, cp):
+        if cp:
+            return core.shape[:-2], (core.shape[-1], core.shape[-2], core.shape[-1])
+        return core.shape[:-3], tuple(core.shape[-3:])
+
+    def write(block, core, cp):
+        if cp:
+            torch.diagonal(block, dim1=-3, dim2=-1).copy_(core)
+        else:
+            block.copy_(core)
+
+    if cp is None:
+        cp = [False] * len(cores)
+    lead = sizes(cores[0], cp[0])[0]
+    blocks = [sizes(core, c)[1] for core, c in zip(cores, cp)]
+    if stack_spatial:
+        spatial = sum([s for _, s, _ in blocks])
+    else:
+        spatial = blocks[0][1]
+    c = torch.zeros(tuple(lead) + (sum([r for r, _, _ in blocks]), spatial, sum([q for _, _, q in blocks])),
+                    dtype=cores[0].dtype, device=cores[0].device)
+    r0, s0, q0 = 0, 0, 0
+    for core, cp_, (r, s, q) in zip(cores, cp, blocks):
+        write(c[..., r0:r0 + r, s0:s0 + s, q0:q0 + q], core, cp_)
+        r0 += r
+        q0 += q
+        if stack_spatial:
+            s0 += s
+    return c
+
+
+def _core_kron(a, b, batch=False, cp=(False, False)):
+    if cp[0]:  # `a` is a CP factor: the product only populates the diagonal blocks, so we build those directly
+        c = torch.diag_embed(b[..., None] * a[..., None, :, None, :], dim1=-5, dim2=-2)
+    elif cp[1]:
+        c = torch.diag_embed(a[..., None] * b[..., None, :, None, :], dim1=-4, dim2=-1)
+    elif batch:
         assert a.shape[0] == b.shape[0]
         c = a[:, :, None, :, :, None] * b[:, None, :, :, None, :]
-        c = c.reshape([a.shape[0], a.shape[1] * b.shape[1], -1, a.shape[-1] * b.shape[-1]])
     else:
         c = a[:, None, :, :, None] * b[None, :, :, None, :]
-        c = c.reshape([a.shape[0] * b.shape[0], -1, a.shape[-1] * b.shape[-1]])
-    return c
+    return c.reshape(c.shape[:-5] + (c.shape[-5] * c.shape[-4], c.shape[-3], c.shape[-2] * c.shape[-1]))
@@ -2,7 +2,6 @@ import tntorch as tn
 import torch
 import numpy as np
 import time
-import scipy.fftpack
 
 
 """
@@ -65,14 +64,14 @@ def cat(*ts, dim):
     if hasattr(ts[0], '__len__'):
         ts = ts[0]
     if len(ts) == 1:
-        return ts[0].clone()
+        return ts[0]._shallow_copy()
     if any([any([t.shape[n] != ts[0].shape[n] for n in np.delete(range(ts[0].dim()), dim)]) for t in ts[1:]]):
         raise ValueError('To concatenate tensors, all must have the same shape along all but the given dim')
 
     shapes = np.array([t.shape[dim] for t in ts])
     sumshapes = np.concatenate([np.array([0]), np.cumsum(shapes)])
     for i in range(len(ts)):
-        t = ts[i].clone()
+        t = ts[i]._shallow_copy()
         if t.Us[dim] is None:
             if t.cores[dim].dim() == 2:
                 t.cores[dim] = torch.zeros(sumshapes[-1], t.cores[dim].shape[-1])
@@ -106,15 +105,14 @@ def transpose(t):
             cores.append(t.cores[n].permute(2, 1, 0))
         else:
             cores.append(t.cores[n])
-        if t.Us[n] is None:
-            Us.append(None)
-        else:
-            Us.append(t.Us[n].clone())
+        Us.append(t.Us[n])
         try:
             idxs.append(t.idxs[n].clone())
         except Exception:
             idxs.append(None)
-    return tn.Tensor(cores, Us, idxs)
+    result = tn.Tensor(cores, Us, idxs)
+    result._share(t)  # Cores are permuted views, shared like the factors (copy-on-write)
+    return result
 
 
 def meshgrid(*axes, batch=False):
@@ -165,7 +163,7 @@ def flip(t, dim):
         dim = [dim]
 
     shape = t.shape
-    result = t.clone()
+    result = t._shallow_copy()
     for d in dim:
         idx = np.arange(shape[d]-1, -1, -1)
         if result.Us[d] is not None:
@@ -190,6 +188,54 @@ def unbind(t, dim):
     return [t[[slice(None)]*dim + [sl] + [slice(None)]*(t.dim()-1-dim)] for sl in range(t.shape[dim])]
 
 
+def stack(ts):
+    """
+    Stacks a list of tensors with the same shape into one batch tensor (the inverse of
+    :meth:`tensor.Tensor.unbind_batch()`).
+
+    The tensors may have different ranks: cores are zero-padded to the largest rank found at each bond, and Tucker
+    factors to the largest Tucker rank. The zero blocks act as rank masks; all batch kernels handle them exactly, so
+    heterogeneous tensors are processed together instead of in a Python loop. If at some mode only some tensors are in
+    the CP format (or have a Tucker factor), those are cast to the TT format (or decompressed along that factor).
+
+    :param ts: a list of :class:`Tensor` (not batch), all with the same shape
+
+    :return: a batch :class:`Tensor`
+    """
+
+    if any([t.batch for t in ts]):
+        raise ValueError('Only non-batch tensors can be stacked')
+    shape = ts[0].shape
+    for t in ts:
+        if not np.array_equal(t.shape, shape):
+            raise ValueError('All tensors must have the same shape, but found {} and {}'.format(shape, t.shape))
+    N = ts[0].dim()
+    device = ts[0].cores[0].device
+
+    # All tensors must have the same format at each mode
+    ts = list(ts)
+    for n in range(N):
+        has_factor = [t.Us[n] is not None for t in ts]
+        if any(has_factor) and not all(has_factor):
+            ts = [t.decompress_tucker_factors(dim=n, _clone=False) for t in ts]
+    is_cp = np.array([[c.dim() == 2 for c in t.cores] for t in ts])
+    if np.any(np.any(is_cp, axis=0) != np.all(is_cp, axis=0)):
+        for k in np.nonzero(np.any(is_cp, axis=1))[0]:  # Tucker factors are kept (unlike with tt())
+            ts[k] = ts[k]._shallow_copy()
+            ts[k]._cp_to_tt()
+
+    def pad(nodes):
+        size = [max([node.shape[d] for node in nodes]) for d in range(nodes[0].dim())]
+        result = torch.zeros([len(nodes)] + size, dtype=nodes[0].dtype, device=device)
+        for k, node in enumerate(nodes):
+            result[(k, ) + tuple([slice(0, sh) for sh in node.shape])] = node
+        return result
+
+    cores = [pad([t.cores[n] for t in ts]) for n in range(N)]
+    Us = [None if ts[0].Us[n] is None else pad([t.Us[n] for t in ts]) for n in range(N)]
+    return tn.Tensor(cores, Us=Us, batch=True)
+
+
 def unfolding(data, n, batch=False):
     """
     Computes the `n-th mode unfolding <https://epubs.siam.org/doi/pdf/10.1137/07070111X>`_ of a PyTorch tensor.
@@ -294,15 +340,14 @@ def ttm(t, U, dim=None, transpose=False):
                         cores.append(torch.einsum('ai,ja->ji', (t.cores[n], factor)))
                 Us.append(None)
             else:
-                cores.append(t.cores[n].clone())
+                cores.append(t.cores[n])
                 Us.append(torch.matmul(factor, t.Us[n]))
         else:
-            cores.append(t.cores[n].clone())
-            if t.Us[n] is None:
-                Us.append(None)
-            else:
-                Us.append(t.Us[n].clone())
-    return tn.Tensor(cores, Us=Us, idxs=t.idxs, batch=t.batch)
+            cores.append(t.cores[n])
+            Us.append(t.Us[n])
+    result = tn.Tensor(cores, Us=Us, idxs=t.idxs, batch=t.batch)
+    result._share(t)  # Untouched nodes are shared (copy-on-write)
+    return result
 
 
 """
@@ -405,6 +450,9 @@ def generate_basis(name, shape, orthonormal=False):
     """
     Generate a factor matrix whose columns are functions of a truncated basis.
 
+    The cost is :math:`O(IS)` for 'dct' and 'identity', and :math:`O(IS^2)` for the polynomial bases, where
+    :math:`I \\times S` is the `shape`.
+
     :param name: 'dct', 'legendre', 'chebyshev' or 'hermite'
     :param shape: two integers
     :param orthonormal: whether to orthonormalize the basis
@@ -413,26 +461,141 @@ def generate_basis(name, shape, orthonormal=False):
     :return: a PyTorch matrix of `shape`
     """
 
-    if name == "dct":
-        U = scipy.fftpack.dct(np.eye(shape[0]), norm="ortho")[:, :shape[1]]
+    if name == "dct":  # Orthonormal DCT-II: same as scipy.fftpack.dct(np.eye(shape[0]), norm="ortho")[:, :shape[1]]
+        i = np.arange(shape[0])[:, None]
+        k = np.arange(min(shape[0], shape[1]))[None, :]
+        U = np.sqrt(2. / shape[0]) * np.cos(np.pi * k * (2*i + 1) / (2*shape[0]))
+        U[:, 0] /= np.sqrt(2)
     elif name == 'identity':
         U = np.eye(shape[0], shape[1])
     else:
         eval_points = np.linspace(-1, 1, shape[0])
+        coefficients = np.eye(min(shape[0], shape[1]), shape[1])  # Column k: the k-th polynomial
         if name == "legendre":
-            U = np.polynomial.legendre.legval(eval_points, np.eye(shape[0], shape[1])).T
+            U = np.polynomial.legendre.legval(eval_points, coefficients).T
         elif name == "chebyshev":
-            U = np.polynomial.chebyshev.chebval(eval_points, np.eye(shape[0], shape[1])).T
+            U = np.polynomial.chebyshev.chebval(eval_points, coefficients).T
         elif name == "hermite":
-            U = np.polynomial.hermite.hermval(eval_points, np.eye(shape[0], shape[1])).T
+            U = np.polynomial.hermite.hermval(eval_points, coefficients).T
         else:
             raise ValueError("Unsupported basis function")
     if orthonormal:
-        U / np.sqrt(np.sum(U*U, axis=0))
+        U = U / np.sqrt(np.sum(U*U, axis=0))
     return torch.from_numpy(U)
 
 
-def reduce(ts, function, eps=0, rmax=np.iinfo(np.int32).max, algorithm='svd', verbose=False, **kwargs):
+def dct(x, dim=-1, inverse=False):
+    """
+    Orthonormal discrete cosine transform (DCT-II) along one dimension of a PyTorch tensor, or its inverse (DCT-III).
+
+    It is computed with an FFT, in :math:`O(I \\log I)` operations per fiber. For a vector `x`, the DCT-II is
+    :math:`U^T x` and its inverse is :math:`Ux`, where :math:`U` is `generate_basis('dct', (I, I))`, which is never
+    formed.
+
+    :param x: a PyTorch tensor
+    :param dim: dimension along which to transform (default is the last one)
+    :param inverse: if True, compute the inverse transform. Default is False
+
+    :return: a PyTorch tensor of the same shape as `x`
+    """
+
+    x = x.transpose(dim, -1)
+    N = x.shape[-1]
+    if not (hasattr(torch, 'fft') and hasattr(torch.fft, 'fft')):  # Older PyTorch versions: dense product
+        U = generate_basis('dct', (N, N)).to(x.dtype).to(x.device)
+        if inverse:
+            U = U.t()
+        return torch.matmul(x, U).transpose(dim, -1)
+
+    k = torch.arange(N, dtype=x.dtype, device=x.device)
+    angle = np.pi * k / (2*N)
+    scale = torch.full_like(k, np.sqrt(2. / N))
+    scale[0] = np.sqrt(1. / N)
+    if not inverse:  # Makhoul's algorithm: even entries, then odd entries in reverse order
+        V = torch.fft.fft(torch.cat((x[..., ::2], torch.flip(x[..., 1::2], [-1])), dim=-1))
+        result = (V.real*torch.cos(angle) + V.imag*torch.sin(angle)) * scale
+    else:
+        h = x / scale
+        h_reversed = torch.cat((torch.zeros_like(h[..., :1]), torch.flip(h[..., 1:], [-1])), dim=-1)
+        V = torch.complex(h, -h_reversed) * torch.complex(torch.cos(angle), torch.sin(angle))
+        v = torch.fft.ifft(V).real
+        half = (N+1) // 2
+        result = torch.empty_like(x)
+        result[..., ::2] = v[..., :half]
+        result[..., 1::2] = torch.flip(v[..., half:], [-1])
+    return result.transpose(dim, -1)
+
+
+def spectral_tucker(t, ranks, basis='dct'):
+    """
+    FFT-based projection helper: projects a tensor onto the leading functions of a spectral basis along each mode, i.e.
+    compresses it into a Tucker format whose factors are truncated bases.
+
+    - 'dct': the orthonormal DCT-II basis (see :func:`generate_basis()`)
+    - 'chebyshev': Chebyshev polynomials :math:`T_0, \\dots, T_{S-1}`, for tensors sampled at the Chebyshev nodes
+      :math:`x_i = \\cos(\\pi (2i+1) / 2I)`, :math:`i = 0, \\dots, I-1` (in decreasing order). There,
+      :math:`T_k(x_i)` is the :math:`k`-th DCT function up to a constant, so the cores hold Chebyshev coefficients.
+      On other grids, such as the equispaced one of `generate_basis('chebyshev', ...)`, there is no fast transform
+
+    The cores (or existing factors) are transformed with :func:`dct()`, so no :math:`I \\times I` matrix is ever
+    formed: the cost along a mode of size :math:`I` is :math:`O(I \\log I)` per fiber. The new factors are ordinary
+    dense :math:`I \\times S` matrices, built in :math:`O(IS)`: all other functions use them like any other factor.
+
+    :param t: a :class:`Tensor`
+    :param ranks: an integer (or list): number of basis functions to keep along each mode (None to leave a mode as is)
+    :param basis: 'dct' (default) or 'chebyshev'
+
+    :return: a :class:`Tensor`
+    """
+
+    N = t.dim()
+    if not hasattr(ranks, '__len__'):
+        ranks = [ranks]*N
+    if len(ranks) != N:
+        raise ValueError('Expected {} ranks, got {}'.format(N, len(ranks)))
+    if basis not in ('dct', 'chebyshev'):
+        raise ValueError("Unsupported basis '{}': use 'dct' or 'chebyshev'".format(basis))
+
+    cores = []
+    Us = []
+    for n in range(N):
+        core = t.cores[n]
+        U = t.Us[n]
+        if ranks[n] is None:
+            cores.append(core)
+            Us.append(U)
+            continue
+        I = t.shape[n + 1] if t.batch else t.shape[n]
+        S = min(ranks[n], I)
+        if U is None:  # The spatial index is the second to last one, both for TT and CP cores
+            cores.append(dct(core, dim=-2)[..., :S, :])
+        else:
+            coefficients = dct(U, dim=-2)[..., :S, :]
+            if t.batch:
+                if core.dim() == 3:
+                    cores.append(torch.einsum('bjk,baj->bak', (core, coefficients)))
+                else:
+                    cores.append(torch.einsum('bijk,baj->biak', (core, coefficients)))
+            else:
+                if core.dim() == 2:
+                    cores.append(torch.einsum('jk,aj->ak', (core, coefficients)))
+                else:
+                    cores.append(torch.einsum('ijk,aj->iak', (core, coefficients)))
+        factor = generate_basis('dct', (I, S)).to(core.dtype).to(core.device)
+        if basis == 'chebyshev':  # T_k(x_i) is the k-th DCT function divided by its normalization constant
+            scale = torch.full((S,), np.sqrt(2. / I), dtype=core.dtype, device=core.device)
+            scale[0] = np.sqrt(1. / I)
+            factor = factor / scale
+            cores[-1] = cores[-1] * scale[:, None]
+        if t.batch:
+            factor = factor[None, ...].repeat(t.shape[0], 1, 1)
+        Us.append(factor)
+    result = tn.Tensor(cores, Us, idxs=t.idxs, batch=t.batch)
+    result._share(t)  # Modes that are not projected are shared (copy-on-write)
+    return result
+
+
+def reduce(ts, function, eps=0, rmax=np.iinfo(np.int32).max, algorithm=None, verbose=False, **kwargs):
     """
     Compute a tensor as a function to all tensors in a sequence.
 
@@ -491,7 +654,7 @@ def pad(t, shape, dim=None, fill_value=0):
     if not hasattr(shape, '__len__'):
         shape = [shape]*len(dim)
 
-    t = t.clone()
+    t = t._shallow_copy()
     for i in range(len(dim)):
         mult = 0
         if i == 0: